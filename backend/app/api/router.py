@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.routes import auth, users, channels, streams, clips, search, home, categories, follows, me, hls_proxy
+from app.api.routes import auth, users, channels, streams, clips, search, home, categories, follows, me, hls_proxy, metrics
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="", tags=["auth"])
@@ -13,4 +13,5 @@ api_router.include_router(categories.router, prefix="", tags=["categories"])
 api_router.include_router(follows.router, prefix="", tags=["follows"])
 api_router.include_router(me.router, prefix="", tags=["me"]) 
 
-api_router.include_router(hls_proxy.router, prefix="", tags=["hls"]) 
+api_router.include_router(hls_proxy.router, prefix="", tags=["hls"])
+api_router.include_router(metrics.router, prefix="", tags=["metrics"])
@@ -1,23 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, HTTPException
 from jose.exceptions import JWTError
-from sqlalchemy.orm import Session
 
-from app.core.deps import get_db
 from app.core.security import decode_token, access_token
 from app.schemas.auth import RegisterIn, LoginIn, TokenOut, RefreshIn
-from app.services.auth_service import register_user, login
+from app.services.auth_service import register_user, login, issue_tokens
 
 router = APIRouter()
 
 @router.post("/register", response_model=TokenOut)
-def register(payload: RegisterIn, db: Session = Depends(get_db)):
-    u = register_user(db, payload.username, payload.email, payload.password, payload.display_name)
-    tokens = login(db, payload.email, payload.password, remember_me=True)
+async def register(payload: RegisterIn):
+    user_id = await register_user(payload.username, payload.email, payload.password, payload.display_name)
+    # The password was just hashed; verifying it again through login() would cost a second Argon2 run
+    tokens = issue_tokens(user_id, remember_me=True)
     return TokenOut(access_token=tokens["access_token"], refresh_token=tokens["refresh_token"])
 
 @router.post("/auth/login", response_model=TokenOut)
-def do_login(payload: LoginIn, db: Session = Depends(get_db)):
-    tokens = login(db, payload.email, payload.password, remember_me=payload.remember_me)
+async def do_login(payload: LoginIn):
+    tokens = await login(payload.email, payload.password, remember_me=payload.remember_me)
     return TokenOut(access_token=tokens["access_token"], refresh_token=tokens["refresh_token"])
 
 @router.post("/auth/refresh", response_model=TokenOut)
@@ -1,67 +1,88 @@
 import random
 from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_db
-from app.models.category import Category
+from app.core.config import settings
+from app.core.deps import get_read_db
+from app.core.etag import conditional
+from app.core.serialization import CATEGORY_CARD, SAMPLE_STREAM_CARD, json_response, serialize_all
 from app.models.stream import Stream
 from app.models.channel import Channel
 from app.models.user import User
+from app.services.category_stats import category_stats
+from app.services.live_directory import live_directory
 
 router = APIRouter()
 
 @router.get("/categories")
-def list_categories(db: Session = Depends(get_db)):
-    cats = db.query(Category).order_by(Category.viewer_count.desc()).all()
-    return {
-        "items": [
-            {
-                "category_id": c.category_id,
-                "name": c.name,
-                "box_art": c.box_art,
-                "viewer_count": c.viewer_count,
-                "streamer_count": c.streamer_count,
-            }
-            for c in cats
-        ]
-    }
+def list_categories(etag: dict = Depends(conditional("categories")), db: Session = Depends(get_read_db)):
+    category_stats.ensure_fresh(db)
+    return json_response({"items": serialize_all(CATEGORY_CARD, category_stats.ranked())}, headers=etag)
+
+def _sample_live_streams(db: Session, per: int) -> dict:
+    """
+    Up to `per` random live streams for every category in a single query: rows are numbered
+    in random order within each category and only the first `per` of each come back.
+    """
+    rn = func.row_number().over(partition_by=Stream.category_id, order_by=func.random()).label("rn")
+    ranked = (
+        select(
+            Stream.stream_id,
+            Stream.title,
+            Stream.thumbnail_url,
+            Stream.started_at,
+            Stream.category_id,
+            User.username,
+            User.display_name,
+            User.avatar_url,
+            Channel.current_viewer_count,
+            rn,
+        )
+        .join(Channel, Channel.channel_id == Stream.channel_id)
+        .join(User, User.user_id == Channel.user_id)
+        .where(Channel.is_live == True, Stream.ended_at.is_(None), Stream.category_id.is_not(None))
+        .subquery()
+    )
+
+    by_category: dict = {}
+    for r in db.execute(select(ranked).where(ranked.c.rn <= per)).all():
+        by_category.setdefault(r.category_id, []).append({
+            "stream_id": r.stream_id,
+            "title": r.title,
+            "thumbnail_url": r.thumbnail_url,
+            "started_at": str(r.started_at),
+            "channel_username": r.username,
+            "channel_display_name": r.display_name or r.username,
+            "channel_avatar_url": r.avatar_url,
+            "viewer_count": r.current_viewer_count or 0,
+        })
+    return by_category
 
 @router.get("/categories/samples")
 def category_samples(
     per: int = Query(default=3, ge=1, le=10),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    cats = db.query(Category).order_by(Category.viewer_count.desc()).all()
-    out = []
+    category_stats.ensure_fresh(db)
+    cats = category_stats.ranked()
 
-    for c in cats:
-        # get live streams in this category
-        rows = (
-            db.query(Stream, Channel, User)
-            .join(Channel, Channel.channel_id == Stream.channel_id)
-            .join(User, User.user_id == Channel.user_id)
-            .filter(Channel.is_live == True, Stream.ended_at.is_(None))
-            .filter(Stream.category_id == c.category_id)
-            .all()
-        )
-
-        random.shuffle(rows)
-        rows = rows[:per]
+    if settings.LIVE_DIRECTORY_ENABLED:
+        live_directory.ensure_fresh(db)
+        by_category = {}
+        for c in cats:
+            group = live_directory.in_category(c.category_id)
+            picked = random.sample(group, per) if len(group) > per else group
+            by_category[c.category_id] = serialize_all(SAMPLE_STREAM_CARD, picked)
+    else:
+        by_category = _sample_live_streams(db, per)
 
-        streams = []
-        for s, ch, u in rows:
-            streams.append({
-                "stream_id": s.stream_id,
-                "title": s.title,
-                "thumbnail_url": s.thumbnail_url,
-                "started_at": str(s.started_at),
-                "channel_username": u.username,
-                "channel_display_name": u.display_name or u.username,
-                "channel_avatar_url": u.avatar_url,
-                "category_id": c.category_id,
-                "category_name": c.name,
-                "viewer_count": ch.current_viewer_count or 0,
-            })
+    out = []
+    for c in cats:
+        streams = by_category.get(c.category_id, [])
+        for st in streams:
+            st["category_id"] = c.category_id
+            st["category_name"] = c.name
 
         out.append({
             "category_id": c.category_id,
@@ -71,4 +92,4 @@ def category_samples(
             "samples": streams,
         })
 
-    return {"items": out}
+    return json_response({"items": out})
@@ -1,11 +1,10 @@
-import random
 from typing import Optional
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_db, get_current_user, get_current_user_optional
-from app.services.channel_service import get_or_create_channel, get_channel_by_username
-from app.models.channel import Channel
+from app.core.deps import get_db, get_read_db, get_current_user, get_current_user_optional
+from app.core.etag import conditional
+from app.services.channel_service import get_or_create_channel, get_channel_by_username, recommended_channels
 from app.models.user import User
 
 router = APIRouter()
@@ -13,18 +12,16 @@ router = APIRouter()
 @router.get("/recommended")
 def recommended(
     limit: int = Query(default=10, ge=1, le=50),
-    db: Session = Depends(get_db),
+    live_first: bool = Query(default=False),
+    db: Session = Depends(get_read_db),
     actor: Optional[User] = Depends(get_current_user_optional),
 ):
-    q = (
-        db.query(Channel, User)
-        .join(User, User.user_id == Channel.user_id)
+    rows = recommended_channels(
+        db,
+        limit,
+        exclude_user_id=actor.user_id if actor else None,
+        live_first=live_first,
     )
-    if actor:
-        q = q.filter(User.user_id != actor.user_id)
-    rows = q.all()
-    random.shuffle(rows)
-    rows = rows[:limit]
     return {
         "items": [
             {
@@ -50,7 +47,7 @@ def become_devolo(db: Session = Depends(get_db), actor=Depends(get_current_user)
     }
 
 @router.get("/{username}")
-def channel(username: str, db: Session = Depends(get_db)):
+def channel(username: str, db: Session = Depends(get_read_db), _etag: dict = Depends(conditional("users", "channels"))):
     ch = get_channel_by_username(db, username)
     return {
         "channel_id": ch.channel_id,
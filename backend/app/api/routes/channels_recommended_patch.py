@@ -1,20 +1,11 @@
-import random
 from fastapi import Depends, Query
 from sqlalchemy.orm import Session
 
 from app.core.deps import get_db
-from app.models.channel import Channel
-from app.models.user import User
+from app.services import channel_service
 
 def recommended_channels(limit: int, db: Session):
-    rows = (
-        db.query(Channel, User)
-        .join(User, User.user_id == Channel.user_id)
-        .all()
-    )
-
-    random.shuffle(rows)
-    rows = rows[:limit]
+    rows = channel_service.recommended_channels(db, limit)
 
     return {
         "items": [
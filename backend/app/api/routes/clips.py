@@ -1,46 +1,59 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_db
-from app.services.clip_service import list_clips, list_user_clips
+from app.core.deps import get_read_db
+from app.core.etag import conditional
+from app.core.serialization import CLIP_CARD, json_response, serialize_all
+from app.services.clip_service import decode_cursor, list_clips, list_user_clips
+from app.services.clip_views import clip_views
 from app.services.user_service import get_profile
-from app.models.category import Category
 
 router = APIRouter()
 
 
-def _clip_to_card(db_cat_map: dict, c):
-    s = c.stream
-    ch = s.channel if s else None
-    u = ch.user if ch else None
-    return {
-        "clip_id": c.clip_id,
-        "title": c.title,
-        "thumbnail_url": c.thumbnail_url,
-        "duration_seconds": c.duration_seconds,
-        "view_count": c.view_count,
-        "channel": {
-            "username": u.username,
-            "display_name": (u.display_name or u.username),
-            "avatar_url": u.avatar_url,
-        }
-        if u
-        else None,
-        "category": {
-            "category_id": (s.category_id if s else None),
-            "name": (db_cat_map.get(s.category_id) if s else None),
-        },
-    }
+def _clip_page(page, etag: dict):
+    """
+    The body stays a plain list of cards; the next page's cursor travels in X-Next-Cursor.
+    view_count is the stored count only: views still pending in clip_views show after the next
+    flush, which is also when the "clips" version (and so the ETag) changes.
+    """
+    rows, next_cursor = page
+    headers = dict(etag)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return json_response(serialize_all(CLIP_CARD, rows), headers=headers)
 
 
 @router.get("/clips")
-def clips(db: Session = Depends(get_db)):
-    cat_map = {c.category_id: c.name for c in db.query(Category).all()}
-    return [_clip_to_card(cat_map, c) for c in list_clips(db)]
+def clips(
+    limit: int = Query(default=24, ge=1, le=100),
+    cursor: str | None = Query(default=None, description="X-Next-Cursor of the previous page"),
+    db: Session = Depends(get_read_db),
+    etag: dict = Depends(conditional("clips", "users")),
+):
+    after = decode_cursor(cursor) if cursor else None
+    return _clip_page(list_clips(db, limit, after), etag)
 
 
 @router.get("/profile/{username}/clips")
-def profile_clips(username: str, db: Session = Depends(get_db)):
+def profile_clips(
+    username: str,
+    limit: int = Query(default=24, ge=1, le=100),
+    cursor: str | None = Query(default=None, description="X-Next-Cursor of the previous page"),
+    db: Session = Depends(get_read_db),
+    etag: dict = Depends(conditional("clips", "users")),
+):
+    after = decode_cursor(cursor) if cursor else None
     u = get_profile(db, username)
-    cat_map = {c.category_id: c.name for c in db.query(Category).all()}
-    return [_clip_to_card(cat_map, c) for c in list_user_clips(db, u)]
+    return _clip_page(list_user_clips(db, u, limit, after), etag)
+
+
+@router.post("/clips/{clip_id}/view", status_code=202)
+async def record_clip_view(clip_id: str):
+    """
+    Counts one view of a clip. The count is kept in memory and written to clips.view_count on
+    the next flush; unknown clip ids are simply never matched by it.
+    """
+    if not clip_views.record(clip_id):
+        raise HTTPException(status_code=503, detail="Too many pending clip views, please retry")
+    return {"ok": True}
@@ -1,10 +1,17 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Dict, List, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_db, get_current_user
+from app.core.auth_cache import invalidate_user
+from app.core.deps import get_db, get_read_db, get_current_user
+from app.core.etag import versions
+from app.core.serialization import LIVE_STREAM_CARD, json_response
 from app.models.follow import Follow
 from app.models.user import User
+from app.services import follow_feed
 
 router = APIRouter()
 
@@ -16,25 +23,83 @@ def _get_user_by_username(db: Session, username: str) -> User:
     return u
 
 
+# Upper bound on usernames + user ids in one bulk status call (one rendered page of cards)
+MAX_BULK_STATUS = 200
+
+
+def _split(values: List[str]) -> List[str]:
+    # Accepts repeated parameters as well as comma-separated lists
+    return list(dict.fromkeys(v.strip() for value in values for v in value.split(",") if v.strip()))
+
+
+def _follow_statuses(
+    request: Request,
+    db: Session,
+    actor_id: str,
+    usernames: List[str] = (),
+    user_ids: List[str] = (),
+) -> Tuple[Dict[str, bool], Dict[str, bool]]:
+    """
+    Whether `actor_id` follows each given username / user id, answered with one IN query joined
+    to follows on (follower_id, followed_user_id). Unknown users are left out. Answers are
+    memoized on the request, so repeated lookups while rendering it cost nothing.
+    """
+    memo = getattr(request.state, "follow_status", None)
+    if memo is None or memo[0] != actor_id:
+        memo = request.state.follow_status = (actor_id, {}, {})
+    _, by_name, by_id = memo
+
+    names = [u for u in usernames if u not in by_name]
+    ids = [u for u in user_ids if u not in by_id]
+    if names or ids:
+        wanted = []
+        if names:
+            wanted.append(User.username.in_(names))
+        if ids:
+            wanted.append(User.user_id.in_(ids))
+        rows = db.execute(
+            select(User.user_id, User.username, Follow.follow_id)
+            .outerjoin(Follow, and_(Follow.follower_id == actor_id, Follow.followed_user_id == User.user_id))
+            .where(or_(*wanted))
+        ).all()
+        for user_id, username, follow_id in rows:
+            following = follow_id is not None and user_id != actor_id
+            by_name[username] = following
+            by_id[user_id] = following
+
+    return (
+        {u: by_name[u] for u in usernames if u in by_name},
+        {u: by_id[u] for u in user_ids if u in by_id},
+    )
+
+
 @router.get("/follows/status")
 def follow_status(
+    request: Request,
     username: str = Query(...),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     actor=Depends(get_current_user),
 ):
-    target = _get_user_by_username(db, username)
-    if target.user_id == actor.user_id:
-        return {"following": False}
+    by_name, _ = _follow_statuses(request, db, actor.user_id, usernames=[username])
+    if username not in by_name:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"following": by_name[username]}
 
-    exists = (
-        db.query(Follow)
-        .filter(
-            Follow.follower_id == actor.user_id,
-            Follow.followed_user_id == target.user_id,
-        )
-        .first()
-    )
-    return {"following": bool(exists)}
+
+@router.get("/follows/status/bulk")
+def follow_status_bulk(
+    request: Request,
+    usernames: List[str] = Query(default=[], description="Repeat the parameter or separate with commas"),
+    user_ids: List[str] = Query(default=[], description="Repeat the parameter or separate with commas"),
+    db: Session = Depends(get_read_db),
+    actor=Depends(get_current_user),
+):
+    """Follow status for a whole grid of channel cards in one call; unknown users are left out."""
+    usernames, user_ids = _split(usernames), _split(user_ids)
+    if len(usernames) + len(user_ids) > MAX_BULK_STATUS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_STATUS} users per call")
+    by_name, by_id = _follow_statuses(request, db, actor.user_id, usernames, user_ids)
+    return {"usernames": by_name, "user_ids": by_id}
 
 
 @router.post("/follows/{username}")
@@ -64,7 +129,10 @@ def follow_user(username: str, db: Session = Depends(get_db), actor=Depends(get_
     # optional: keep counter correct
     target.follower_count = int(target.follower_count or 0) + 1
 
+    versions.bump(db, "users")
     db.commit()
+    invalidate_user(target.user_id)
+    follow_feed.invalidate(actor.user_id)
     return {"ok": True, "following": True}
 
 
@@ -82,12 +150,15 @@ def unfollow_user(username: str, db: Session = Depends(get_db), actor=Depends(ge
     if row:
         db.delete(row)
         target.follower_count = max(0, int(target.follower_count or 0) - 1)
+        versions.bump(db, "users")
         db.commit()
+        invalidate_user(target.user_id)
+        follow_feed.invalidate(actor.user_id)
     return {"ok": True, "following": False}
 
 
 @router.get("/follows/following")
-def following(db: Session = Depends(get_db), actor=Depends(get_current_user)):
+def following(db: Session = Depends(get_read_db), actor=Depends(get_current_user)):
     rows = (
         db.query(Follow, User)
         .join(User, User.user_id == Follow.followed_user_id)
@@ -107,3 +178,25 @@ def following(db: Session = Depends(get_db), actor=Depends(get_current_user)):
             for f, u in rows
         ]
     }
+
+
+@router.get("/follows/live")
+def following_live(db: Session = Depends(get_read_db), actor=Depends(get_current_user)):
+    """
+    Everyone the user follows, live channels first (most viewers first) with their stream card,
+    then the rest in follow order.
+    """
+    return json_response({
+        "items": [
+            {
+                "user_id": e.user_id,
+                "username": e.username,
+                "display_name": e.display_name,
+                "avatar_url": e.avatar_url,
+                "followed_at": e.followed_at,
+                "is_live": card is not None,
+                "stream": LIVE_STREAM_CARD(card) if card is not None else None,
+            }
+            for e, card in follow_feed.live_feed(db, actor.user_id)
+        ]
+    })
@@ -1,22 +1,54 @@
 from __future__ import annotations
 
-from typing import Optional
+import ipaddress
 
-import httpx
 from fastapi import APIRouter, Request, HTTPException, Response
+from starlette.background import BackgroundTask
 from starlette.responses import StreamingResponse
 
 from app.core.config import settings
+from app.services import hls_service
+from app.services.hls_cache import CachedResponse, is_playlist, is_segment, playlist_cache, segment_cache
+from app.services.viewer_tracker import stream_key_from_path, viewer_tracker
 
 router = APIRouter()
 
-def _guess_content_type(path: str) -> str:
-    p = (path or "").lower()
-    if p.endswith(".m3u8"):
-        return "application/vnd.apple.mpegurl"
-    if p.endswith(".ts"):
-        return "video/mp2t"
-    return "application/octet-stream"
+def _cached_response(cached: CachedResponse, **extra_headers: str) -> Response:
+    headers = dict(cached.headers)
+    headers.update(extra_headers)
+    return Response(
+        content=cached.body,
+        status_code=cached.status_code,
+        media_type=cached.media_type,
+        headers=headers,
+    )
+
+_TRUSTED_PROXIES = [
+    ipaddress.ip_network(p.strip(), strict=False) for p in settings.TRUSTED_PROXIES.split(",") if p.strip()
+]
+
+def _is_trusted(host: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(ip in net for net in _TRUSTED_PROXIES)
+
+def _client_ip(request: Request) -> str:
+    peer = request.client.host if request.client else ""
+    forwarded = request.headers.get("x-forwarded-for")
+    # Anyone can send the header; only a trusted proxy's copy says who connected to it
+    if not forwarded or not _is_trusted(peer):
+        return peer
+    hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+    # The client is the last hop not added by one of our own proxies
+    for hop in reversed(hops):
+        if not _is_trusted(hop):
+            return hop
+    return hops[0] if hops else peer
+
+def _viewer_id(request: Request) -> str:
+    return f"{_client_ip(request)}|{request.headers.get('user-agent', '')}"
 
 @router.get("/hls/{path:path}")
 async def proxy_hls(path: str, request: Request):
@@ -28,11 +60,20 @@ async def proxy_hls(path: str, request: Request):
     IMPORTANT: {path:path} is required so nested paths like:
       /hls/<stream>_720p2628kbs/index.m3u8
     are correctly captured.
+
+    Upstream connections come from the shared pool in hls_service, and the body is relayed
+    chunk by chunk so memory use does not grow with segment size.
+
+    Media segments are immutable, so they are served from segment_cache; concurrent misses
+    for the same segment share one upstream fetch. Playlists are micro-cached for a fraction
+    of their target duration, and each new playlist version warms its newest segment.
+
+    Each playlist/segment fetch also counts its client as a viewer of the stream (viewer_tracker).
     """
-    upstream_base = settings.HLS_BASE_URL.rstrip("/")
-    upstream_url = f"{upstream_base}/{path.lstrip('/')}"
-    if request.url.query:
-        upstream_url = f"{upstream_url}?{request.url.query}"
+    upstream_url = hls_service.upstream_url(path, request.url.query)
+
+    if is_playlist(path) or is_segment(path):
+        viewer_tracker.record(stream_key_from_path(path), _viewer_id(request))
 
     # Forward range headers for TS segment requests
     headers = {}
@@ -40,9 +81,30 @@ async def proxy_hls(path: str, request: Request):
     if rng:
         headers["range"] = rng
 
+    if playlist_cache.enabled and is_playlist(path) and not rng:
+        try:
+            cached, ttl = await playlist_cache.get_or_fetch(
+                upstream_url, lambda: hls_service.fetch_buffered(upstream_url, path)
+            )
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"HLS upstream unavailable: {e}")
+        if cached.status_code >= 400:
+            return _cached_response(cached)
+        # Let players and intermediaries share the playlist for as long as we do
+        max_age = int(ttl)
+        return _cached_response(cached, **{"cache-control": f"public, max-age={max_age}" if max_age > 0 else "no-cache"})
+
+    if segment_cache.enabled and is_segment(path):
+        key = (upstream_url, rng)
+        try:
+            cached = await segment_cache.get_or_fetch(key, lambda: hls_service.fetch_buffered(upstream_url, path, headers))
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"HLS upstream unavailable: {e}")
+        return _cached_response(cached)
+
+    client = hls_service.get_client()
     try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=30.0)) as client:
-            r = await client.get(upstream_url, headers=headers)
+        r = await client.send(client.build_request("GET", upstream_url, headers=headers), stream=True)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"HLS upstream unavailable: {e}")
 
@@ -50,20 +112,18 @@ async def proxy_hls(path: str, request: Request):
     status_code = r.status_code
     if status_code >= 400:
         # Provide a compact error while keeping status code
-        return Response(content=r.content, status_code=status_code, media_type="text/plain")
-
-    content_type = r.headers.get("content-type") or _guess_content_type(path)
-
-    # Preserve some headers useful for streaming
-    resp_headers = {}
-    for k in ("accept-ranges", "content-range", "cache-control"):
-        if k in r.headers:
-            resp_headers[k] = r.headers[k]
-
-    # Ensure no caching for live content
-    resp_headers.setdefault("cache-control", "no-cache")
+        try:
+            body = await r.aread()
+        finally:
+            await r.aclose()
+        return Response(content=body, status_code=status_code, media_type="text/plain")
 
-    # CORS (even though same-origin usually, it doesn't hurt and helps if API is on a different port)
-    resp_headers["access-control-allow-origin"] = "*"
+    content_type = r.headers.get("content-type") or hls_service.guess_content_type(path)
 
-    return Response(content=r.content, status_code=status_code, media_type=content_type, headers=resp_headers)
+    return StreamingResponse(
+        r.aiter_bytes(settings.HLS_STREAM_CHUNK_BYTES),
+        status_code=status_code,
+        media_type=content_type,
+        headers=hls_service.response_headers(r),
+        background=BackgroundTask(r.aclose),
+    )
@@ -1,61 +1,55 @@
-import random
 from typing import Optional
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.deps import get_db, get_current_user_optional
+from app.core.config import settings
+from app.core.deps import get_async_db, get_current_user_optional_async
+from app.core.serialization import HOME_CLIP_CARD, HOME_STREAM_CARD, json_response, serialize_all
 from app.models.stream import Stream
 from app.models.channel import Channel
 from app.models.user import User
 from app.models.clip import Clip
 from app.models.category import Category
+from app.services.clip_views import clip_views
+from app.services.live_directory import live_directory, query_live_cards_async
 
 router = APIRouter()
 
 @router.get("/home")
-def home(db: Session = Depends(get_db), actor: Optional[User] = Depends(get_current_user_optional)):
+async def home(db: AsyncSession = Depends(get_async_db), actor: Optional[User] = Depends(get_current_user_optional_async)):
     # live (top 9)
-    # live (top 9)
-    live_q = (
-        db.query(Stream, Channel, User, Category)
-        .join(Channel, Channel.channel_id == Stream.channel_id)
-        .join(User, User.user_id == Channel.user_id)
-        .join(Category, Category.category_id == Stream.category_id, isouter=True)
-        .filter(Channel.is_live == True, Stream.ended_at.is_(None))
-    )
+    exclude = actor.user_id if actor else None
+    if settings.LIVE_DIRECTORY_ENABLED:
+        await live_directory.ensure_fresh_async(db)
+        cards = live_directory.top(9, exclude_user_id=exclude)
+    else:
+        cards = await query_live_cards_async(db, limit=9, exclude_user_id=exclude)
 
-    if actor:
-        live_q = live_q.filter(User.user_id != actor.user_id)
-
-    live_rows = (
-        live_q.order_by((Channel.current_viewer_count).desc())
-        .limit(9)
-        .all()
-    )
-
-    live = []
-    for s, ch, u, cat in live_rows:
-        live.append({
-            "stream_id": s.stream_id,
-            "title": s.title,
-            "thumbnail_url": s.thumbnail_url,
-            "started_at": str(s.started_at) if s.started_at else None,
-            "channel_id": ch.channel_id,
-            "channel_username": u.username,
-            "channel_display_name": u.display_name or u.username,
-            "channel_avatar_url": u.avatar_url,
-            "viewer_count": ch.current_viewer_count or 0,
-            "category_id": s.category_id,
-            "category_name": cat.name if cat else None,
-        })
+    live = serialize_all(HOME_STREAM_CARD, cards)
 
     # clips (top 20 by view_count)
     #
     # IMPORTANT: your Clip model does NOT have channel_id.
     # We reach Channel through Stream: Clip.stream_id -> Stream.channel_id -> Channel.user_id -> User
     #
+    # Only the card's columns, under the names HOME_CLIP_CARD reads
     clip_q = (
-        db.query(Clip, Stream, Channel, User, Category)
+        select(
+            Clip.clip_id,
+            Clip.title,
+            Clip.thumbnail_url,
+            Clip.duration_seconds,
+            Clip.view_count,
+            Clip.stream_id,
+            Channel.channel_id,
+            User.username.label("channel_username"),
+            func.coalesce(func.nullif(User.display_name, ""), User.username).label("channel_display_name"),
+            User.avatar_url.label("channel_avatar_url"),
+            Stream.category_id,
+            Category.name.label("category_name"),
+        )
+        .select_from(Clip)
         .join(Stream, Stream.stream_id == Clip.stream_id)
         .join(Channel, Channel.channel_id == Stream.channel_id)
         .join(User, User.user_id == Channel.user_id)
@@ -65,29 +59,15 @@ def home(db: Session = Depends(get_db), actor: Optional[User] = Depends(get_curr
     )
 
     if actor:
-        clip_q = clip_q.filter(User.user_id != actor.user_id)
+        clip_q = clip_q.where(User.user_id != actor.user_id)
 
-    clip_rows = (
+    clip_rows = (await db.execute(
         clip_q.order_by(Clip.view_count.desc())
         .limit(20)
-        .all()
-    )
+    )).all()
 
-    clips = []
-    for c, s, ch, u, cat in clip_rows:
-        clips.append({
-            "clip_id": c.clip_id,
-            "title": c.title,
-            "thumbnail_url": c.thumbnail_url,
-            "duration_seconds": c.duration_seconds,
-            "view_count": c.view_count,
-            "stream_id": c.stream_id,
-            "channel_id": ch.channel_id,
-            "channel_username": u.username,
-            "channel_display_name": u.display_name or u.username,
-            "channel_avatar_url": u.avatar_url,
-            "category_id": s.category_id,
-            "category_name": cat.name if cat else None,
-        })
+    clips = serialize_all(HOME_CLIP_CARD, clip_rows)
+    for clip in clips:
+        clip["view_count"] = (clip["view_count"] or 0) + clip_views.pending(clip["clip_id"])
 
-    return {"live": live, "clips": clips}
+    return json_response({"live": live, "clips": clips})
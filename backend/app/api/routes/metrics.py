@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+
+from app.core import auth_cache
+from app.core.etag import versions
+from app.core.security import hash_stats
+from app.core.startup import startup
+
+from app.services.category_stats import category_stats
+from app.services.chat_broker import chat_broker
+from app.services.chat_history import chat_history
+from app.services import follow_feed
+from app.services.chat_writer import chat_writer
+from app.services.channel_sampler import channel_sampler
+from app.services.clip_views import clip_views
+from app.services.live_directory import live_directory
+from app.services.hls_cache import playlist_cache, segment_cache
+from app.services.viewer_tracker import viewer_tracker
+
+router = APIRouter()
+
+@router.get("/metrics")
+def metrics():
+    return {
+        "hls_segment_cache": segment_cache.stats(),
+        "hls_playlist_cache": playlist_cache.stats(),
+        "chat_broker": chat_broker.stats(),
+        "chat_writer": chat_writer.stats(),
+        "chat_history": chat_history.stats(),
+        "live_directory": live_directory.stats(),
+        "channel_sampler": channel_sampler.stats(),
+        "category_stats": category_stats.stats(),
+        "auth_cache": auth_cache.stats(),
+        "password_hashing": hash_stats(),
+        "follow_sets": follow_feed.stats(),
+        "viewer_tracker": viewer_tracker.stats(),
+        "clip_views": clip_views.stats(),
+        "etag_versions": versions.stats(),
+        "startup": startup.report(),
+    }
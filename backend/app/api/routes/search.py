@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from app.core.deps import get_db
+from app.core.deps import get_read_db
 from app.schemas.search import SearchResult
 from app.services.search_service import search as search_impl
 
 router = APIRouter()
 
 @router.get("/search", response_model=list[SearchResult])
-def search(query: str | None = None, category_id: str | None = None, db: Session = Depends(get_db)):
-    return search_impl(db, query, category_id)
+def search(
+    query: str | None = None,
+    category_id: str | None = None,
+    limit: int = Query(default=20, ge=1, le=50),
+    offset: int = Query(default=0, ge=0, le=1000),
+    db: Session = Depends(get_read_db),
+):
+    return search_impl(db, query, category_id, limit=limit, offset=offset)
@@ -1,49 +1,41 @@
+import asyncio
+import json
 import uuid
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.responses import StreamingResponse
 
-from app.core.deps import get_db, get_current_user
+from app.core.deps import get_async_db, get_db, get_current_user, get_current_user_async
 from app.core.config import settings
+from app.core.etag import conditional
+from app.core.serialization import CHAT_ITEM, LIVE_STREAM_CARD, json_response, serialize_all
 from app.models.stream import Stream
 from app.models.channel import Channel
 from app.models.user import User
 from app.models.category import Category
 from app.models.chat_message import ChatMessage
 
+from app.db.session import AsyncSessionLocal
 from app.services import stream_service
+from app.services.chat_broker import chat_broker
+from app.services.live_directory import live_directory, query_live_cards_async
+from app.services.chat_history import ChatKey, chat_history, decode_cursor, encode_cursor, naive_utc
+from app.services.chat_writer import DuplicateMessageId, chat_writer
 
 router = APIRouter()
 
 @router.get("/live")
-def live_streams(db: Session = Depends(get_db)):
-    rows = (
-        db.query(Stream, Channel, User, Category)
-        .join(Channel, Channel.channel_id == Stream.channel_id)
-        .join(User, User.user_id == Channel.user_id)
-        .join(Category, Category.category_id == Stream.category_id, isouter=True)
-        .filter(Channel.is_live == True, Stream.ended_at.is_(None))
-        .order_by((Channel.current_viewer_count).desc())
-        .all()
-    )
+async def live_streams(db: AsyncSession = Depends(get_async_db)):
+    if settings.LIVE_DIRECTORY_ENABLED:
+        await live_directory.ensure_fresh_async(db)
+        cards = live_directory.ranked()
+    else:
+        cards = await query_live_cards_async(db)
 
-    items = []
-    for s, ch, u, cat in rows:
-        items.append({
-            "stream_id": s.stream_id,
-            "title": s.title,
-            "thumbnail_url": s.thumbnail_url,
-            "started_at": str(s.started_at) if s.started_at else None,
-            "channel_id": ch.channel_id,
-            "channel_username": u.username,
-            "channel_display_name": u.display_name or u.username,
-            "channel_avatar_url": u.avatar_url,
-            "current_viewer_count": ch.current_viewer_count or 0,
-            "category_id": s.category_id,
-            "category_name": cat.name if cat else None,
-        })
-
-    return {"items": items}
+    return json_response({"items": serialize_all(LIVE_STREAM_CARD, cards)})
 
 @router.post("/start")
 def start_stream(payload: dict, db: Session = Depends(get_db), actor=Depends(get_current_user)):
@@ -60,15 +52,18 @@ def start_stream(payload: dict, db: Session = Depends(get_db), actor=Depends(get
 
 
 @router.get("/{stream_id}")
-def get_stream(stream_id: str, db: Session = Depends(get_db)):
-    row = (
-        db.query(Stream, Channel, User, Category)
+async def get_stream(
+    stream_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    _etag: dict = Depends(conditional("streams", "channels", "users")),
+):
+    row = (await db.execute(
+        select(Stream, Channel, User, Category)
         .join(Channel, Channel.channel_id == Stream.channel_id)
         .join(User, User.user_id == Channel.user_id)
         .join(Category, Category.category_id == Stream.category_id, isouter=True)
-        .filter(Stream.stream_id == stream_id)
-        .first()
-    )
+        .where(Stream.stream_id == stream_id)
+    )).first()
     if not row:
         raise HTTPException(status_code=404, detail="Stream not found")
 
@@ -103,58 +98,121 @@ def get_stream(stream_id: str, db: Session = Depends(get_db)):
     }
 
 
-@router.get("/{stream_id}/chat")
-def list_chat_messages(
-    stream_id: str,
-    db: Session = Depends(get_db),
-    limit: int = Query(50, ge=1, le=200),
-    since: str | None = Query(None, description="ISO datetime. Return messages created after this timestamp."),
-):
-    # Ensure stream exists
-    exists = db.query(Stream.stream_id).filter(Stream.stream_id == stream_id).first()
-    if not exists:
-        raise HTTPException(status_code=404, detail="Stream not found")
+# A chat item's columns under the names CHAT_ITEM reads (created_at stays a datetime: orjson
+# writes it in the isoformat() form the chat writer publishes)
+_CHAT_COLUMNS = (
+    ChatMessage.message_id,
+    ChatMessage.stream_id,
+    ChatMessage.user_id,
+    User.username,
+    func.coalesce(func.nullif(User.display_name, ""), User.username).label("display_name"),
+    User.avatar_url,
+    ChatMessage.content,
+    ChatMessage.created_at,
+    ChatMessage.seq,
+)
+
 
+async def _query_chat(
+    db: AsyncSession,
+    stream_id: str,
+    limit: int,
+    after: ChatKey | None = None,
+    before: ChatKey | None = None,
+) -> list[tuple[ChatKey, dict]]:
+    """Keyset page of a stream's chat from the database (served by ix_chat_messages_stream_seq)."""
     q = (
-        db.query(ChatMessage, User)
+        select(*_CHAT_COLUMNS)
         .join(User, User.user_id == ChatMessage.user_id)
-        .filter(ChatMessage.stream_id == stream_id)
+        .where(ChatMessage.stream_id == stream_id)
     )
+    if after is not None:
+        q = q.where(ChatMessage.seq > after).order_by(ChatMessage.seq.asc()).limit(limit)
+        rows = (await db.execute(q)).all()
+    else:
+        if before is not None:
+            q = q.where(ChatMessage.seq < before)
+        q = q.order_by(ChatMessage.seq.desc()).limit(limit)
+        rows = list(reversed((await db.execute(q)).all()))
+
+    return [(row.seq, CHAT_ITEM(row)) for row in rows]
 
-    if since:
+
+@router.get("/{stream_id}/chat")
+async def list_chat_messages(
+    stream_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = Query(50, ge=1, le=200),
+    since: str | None = Query(None, description="ISO datetime. Return messages created after this timestamp."),
+    after: str | None = Query(None, description="Cursor (next_cursor). Return messages newer than it."),
+    before: str | None = Query(None, description="Cursor (prev_cursor). Return the messages just older than it."),
+):
+    """
+    Without parameters returns the latest `limit` messages. `after` / `before` page forwards and
+    backwards with cursors on the message seq (commit order); `since` is kept for older clients.
+    The recent window of a live stream is answered from the in-memory ring buffer.
+    """
+    after_key = decode_cursor(after) if after else None
+    before_key = decode_cursor(before) if before else None
+    if since and after_key is None:
         try:
             # Python 3.11+ accepts ISO strings with Z or offset.
-            dt_since = datetime.fromisoformat(since.replace("Z", "+00:00"))
+            dt_since = naive_utc(datetime.fromisoformat(since.replace("Z", "+00:00")))
         except Exception:
             raise HTTPException(status_code=400, detail="Invalid 'since' timestamp")
-        q = q.filter(ChatMessage.created_at > dt_since)
-
-    rows = q.order_by(ChatMessage.created_at.asc()).limit(limit).all()
-
-    items = []
-    for m, u in rows:
-        items.append(
-            {
-                "message_id": m.message_id,
-                "stream_id": m.stream_id,
-                "user_id": m.user_id,
-                "username": u.username,
-                "display_name": u.display_name or u.username,
-                "avatar_url": u.avatar_url,
-                "content": m.content,
-                "created_at": m.created_at.isoformat() if m.created_at else None,
-            }
-        )
-
-    return {"items": items}
+        # "created_at > since" starts at the first such message; nothing newer yet is an empty page
+        first = (await db.execute(
+            select(ChatMessage.seq)
+            .where(ChatMessage.stream_id == stream_id, ChatMessage.created_at > dt_since)
+            .order_by(ChatMessage.created_at.asc(), ChatMessage.seq.asc())
+            .limit(1)
+        )).scalar()
+        if first is None:
+            return json_response({"items": [], "next_cursor": None, "prev_cursor": None})
+        after_key = first - 1
+
+    rows = None
+    if chat_history.enabled:
+        if chat_history.unchecked_last(stream_id) is not None:
+            # Catches messages committed by other workers (one indexed lookup per REFRESH_SECONDS)
+            newest = (await db.execute(
+                select(func.max(ChatMessage.seq)).where(ChatMessage.stream_id == stream_id)
+            )).scalar()
+            chat_history.confirm(stream_id, newest or 0)
+        if not chat_history.is_warm(stream_id):
+            await _warm_chat_history(db, stream_id)
+        rows = chat_history.window(stream_id, limit, after=after_key, before=before_key)
+
+    if rows is None:
+        # Ensure stream exists
+        exists = (await db.execute(select(Stream.stream_id).where(Stream.stream_id == stream_id))).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Stream not found")
+        rows = await _query_chat(db, stream_id, limit, after=after_key, before=before_key)
+
+    return json_response({
+        "items": [item for _, item in rows],
+        # Poll with ?after=next_cursor for newer messages, page history with ?before=prev_cursor
+        "next_cursor": encode_cursor(rows[-1][0]) if rows else after,
+        "prev_cursor": encode_cursor(rows[0][0]) if rows else None,
+    })
+
+
+async def _warm_chat_history(db: AsyncSession, stream_id: str) -> None:
+    """Loads the ring buffer of a live stream from its newest messages."""
+    s = (await db.execute(select(Stream.ended_at).where(Stream.stream_id == stream_id))).first()
+    if s is None or s[0] is not None:
+        return
+    chat_history.begin_warm(stream_id)
+    chat_history.finish_warm(stream_id, await _query_chat(db, stream_id, chat_history.size))
 
 
 @router.post("/{stream_id}/chat")
-def send_chat_message(
+async def send_chat_message(
     stream_id: str,
     payload: dict,
-    db: Session = Depends(get_db),
-    actor=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    actor=Depends(get_current_user_async),
 ):
     content = (payload or {}).get("content")
     content = (content or "").strip()
@@ -162,40 +220,148 @@ def send_chat_message(
         raise HTTPException(status_code=400, detail="Message cannot be empty")
     if len(content) > 500:
         raise HTTPException(status_code=400, detail="Message too long (max 500 chars)")
+    # Clients may pick the id (a UUID) so that retrying a send never posts the message twice
+    message_id = (payload or {}).get("message_id") or str(uuid.uuid4())
+    try:
+        message_id = str(uuid.UUID(str(message_id)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid message_id")
 
     # Ensure stream exists and is live
-    s = db.query(Stream).filter(Stream.stream_id == stream_id).first()
+    s = (await db.execute(select(Stream.ended_at).where(Stream.stream_id == stream_id))).first()
     if not s:
         raise HTTPException(status_code=404, detail="Stream not found")
 
     if s.ended_at is not None:
         raise HTTPException(status_code=400, detail="Stream has ended")
 
-    m = ChatMessage(
-        message_id=str(uuid.uuid4()),
-        stream_id=stream_id,
-        user_id=actor.user_id,
-        content=content,
-        created_at=datetime.now(timezone.utc),
-    )
-    db.add(m)
-    db.commit()
-    db.refresh(m)
-
-    return {
-        "ok": True,
-        "message": {
-            "message_id": m.message_id,
-            "stream_id": m.stream_id,
-            "user_id": m.user_id,
-            "username": actor.username,
-            "display_name": actor.display_name or actor.username,
-            "avatar_url": actor.avatar_url,
-            "content": m.content,
-            "created_at": m.created_at.isoformat() if m.created_at else None,
-        },
+    row = {
+        "message_id": message_id,
+        "stream_id": stream_id,
+        "user_id": actor.user_id,
+        "content": content,
+        "created_at": datetime.now(timezone.utc),
+    }
+    # Gets its seq, and reaches the ring buffer and subscribers, once the chat writer commits it
+    message = {
+        "message_id": row["message_id"],
+        "stream_id": stream_id,
+        "user_id": actor.user_id,
+        "username": actor.username,
+        "display_name": actor.display_name or actor.username,
+        "avatar_url": actor.avatar_url,
+        "content": content,
+        "created_at": naive_utc(row["created_at"]).isoformat(),
     }
 
+    # End our read transaction first: on SQLite an open reader would block the writer's commit
+    await db.close()
+
+    # Group-committed by the chat writer; "durable" mode waits until the batch holding it is committed
+    fut = chat_writer.submit(row, message)
+    if settings.CHAT_WRITE_MODE == "durable":
+        # Awaited on the event loop rather than blocking a threadpool thread. shield: a timeout
+        # must not cancel the writer's Future, which it still resolves once the batch commits
+        waiter = asyncio.wrap_future(fut)
+        try:
+            message = await asyncio.wait_for(asyncio.shield(waiter), settings.CHAT_WRITE_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Nobody awaits it anymore; the writer logs a failed batch itself
+            waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+            # Still queued, and committed and published once its batch runs: retrying with
+            # this message_id is safe either way
+            return json_response({"ok": True, "queued": True, "message": message}, status_code=202)
+        except DuplicateMessageId:
+            raise HTTPException(status_code=409, detail="message_id is already used")
+        except Exception:
+            raise HTTPException(status_code=503, detail="Chat is busy, please retry")
+
+    return {"ok": True, "message": message}
+
+
+async def _stream_is_live(stream_id: str) -> bool:
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(select(Stream.ended_at).where(Stream.stream_id == stream_id))).first()
+        return row is not None and row[0] is None
+
+
+@router.websocket("/{stream_id}/chat/ws")
+async def chat_websocket(websocket: WebSocket, stream_id: str):
+    """
+    Pushes new chat messages of a live stream as JSON text frames.
+    Sending still goes through POST /streams/{stream_id}/chat; anything the client sends here is ignored.
+    The socket is closed with code 4000 if the client falls too far behind, and 1000 when the stream ends.
+    """
+    if not await _stream_is_live(stream_id):
+        await websocket.close(code=4404)
+        return
+
+    await websocket.accept()
+    sub = chat_broker.subscribe(stream_id)
+
+    async def pump():
+        while True:
+            msg = await sub.get()
+            if msg is None:
+                code = 4000 if sub.closed_reason == "slow_consumer" else 1000
+                await websocket.close(code=code, reason=sub.closed_reason or "")
+                return
+            await websocket.send_json(msg)
+
+    async def drain():
+        # Reading is what notices the client going away
+        while True:
+            await websocket.receive_text()
+
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(drain())]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for t in pending:
+            t.cancel()
+        for t in done:
+            exc = t.exception()
+            if exc is not None and not isinstance(exc, WebSocketDisconnect):
+                raise exc
+    finally:
+        for t in tasks:
+            t.cancel()
+        chat_broker.unsubscribe(sub)
+
+
+@router.get("/{stream_id}/chat/stream")
+async def chat_event_stream(stream_id: str, request: Request):
+    """
+    Server-Sent Events fallback for chat push: one `message` event per chat line, a comment
+    heartbeat while idle, and a final `end` event when the subscription is closed.
+    """
+    if not await _stream_is_live(stream_id):
+        raise HTTPException(status_code=404, detail="Stream not found or not live")
+
+    sub = chat_broker.subscribe(stream_id)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    msg = await sub.get(timeout=settings.CHAT_SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": ping\n\n"
+                    continue
+                if msg is None:
+                    yield f"event: end\ndata: {json.dumps({'reason': sub.closed_reason})}\n\n"
+                    return
+                yield f"id: {msg['message_id']}\nevent: message\ndata: {json.dumps(msg)}\n\n"
+        finally:
+            chat_broker.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"},
+    )
+
 @router.post("/stop/{stream_id}")
 def stop_stream(stream_id: str, db: Session = Depends(get_db), actor=Depends(get_current_user)):
     s = db.query(Stream).filter(Stream.stream_id == stream_id).first()
@@ -206,7 +372,6 @@ def stop_stream(stream_id: str, db: Session = Depends(get_db), actor=Depends(get
     if not ch or ch.user_id != actor.user_id:
         raise HTTPException(status_code=403, detail="Not allowed")
 
-    s.ended_at = datetime.now(timezone.utc)
-    ch.is_live = False
-    db.commit()
+    # Also takes the stream out of the live directory and closes its chat subscriptions
+    stream_service.stop_stream(db, ch, stream_id)
     return {"ok": True}
@@ -1,14 +1,15 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_db, get_current_user
+from app.core.deps import get_db, get_read_db, get_current_user
+from app.core.etag import conditional
 from app.schemas.user import PublicUser, UpdateProfileIn
 from app.services.user_service import get_profile, update_profile, delete_account
 
 router = APIRouter()
 
 @router.get("/profile/{username}", response_model=PublicUser)
-def profile(username: str, db: Session = Depends(get_db)):
+def profile(username: str, db: Session = Depends(get_read_db), _etag: dict = Depends(conditional("users"))):
     u = get_profile(db, username)
     return u
 
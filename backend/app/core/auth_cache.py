@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.session import make_transient_to_detached
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.security import decode_token
+from app.models.user import User
+
+# sha256(token) -> verified claims; an entry never outlives the token's own `exp`
+token_cache = TTLCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL)
+
+# user_id -> detached snapshot of the users row
+user_cache = TTLCache(maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+
+
+def verified_claims(token: str) -> Dict[str, Any]:
+    """decode_token with the signature check memoized per token. Raises JWTError like decode_token."""
+    key = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+
+    claims = decode_token(token)
+    exp = claims.get("exp")
+    if exp is not None:
+        token_cache.set(key, claims, ttl=float(exp) - time.time())
+    return claims
+
+
+def _snapshot(user: User) -> User:
+    data = {c.key: getattr(user, c.key) for c in User.__table__.columns}
+    copy = User(**data)
+    make_transient_to_detached(copy)
+    return copy
+
+
+def load_user(db: Session, user_id: str) -> Optional[User]:
+    """
+    The user row for `user_id`, attached to `db` (cache hits are merged without a SELECT).
+    Auth passes the read session here, so writers re-load the row in their own session.
+    """
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        return db.merge(snapshot, load=False)
+
+    user = db.query(User).filter(User.user_id == user_id).first()
+    if user is not None:
+        user_cache.set(user_id, _snapshot(user))
+    return user
+
+
+async def load_user_async(db: AsyncSession, user_id: str) -> Optional[User]:
+    """load_user for async routes; a cache hit returns the detached snapshot, for reading only."""
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        return snapshot
+
+    user = (await db.execute(select(User).where(User.user_id == user_id))).scalars().first()
+    if user is not None:
+        user_cache.set(user_id, _snapshot(user))
+    return user
+
+
+def invalidate_user(user_id: str) -> None:
+    """Call after any write to a users row (profile, follower_count, deletion)."""
+    user_cache.pop(user_id)
+
+
+def stats() -> dict:
+    return {
+        "tokens": token_cache.stats(),
+        "users": user_cache.stats(),
+    }
@@ -1,21 +1,140 @@
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
     DATABASE_URL: str = "sqlite:///./devolo.db"
+    # Async URL for the AsyncSession routes; derived from DATABASE_URL (aiosqlite / asyncpg) when empty
+    ASYNC_DATABASE_URL: str = ""
+    # Connection pool per engine (sync and async each get one)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    # "production" turns on WAL and the pragmas below for SQLite, and splits it into a pooled
+    # read-only engine plus a single writer connection; "dev" keeps one default engine
+    DB_PROFILE: str = "dev"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 65536
+    SQLITE_MMAP_SIZE: int = 268435456
+    # How long a write waits for the single writer connection before failing
+    DB_WRITER_TIMEOUT: float = 30.0
 
     # Optional: base URL where your HLS streams are served.
     # Example with nginx-rtmp: http://localhost:8080/hls
     HLS_BASE_URL: str = "http://localhost:8080/hls"
 
+    # Shared upstream HTTP client used by the HLS proxy (one pool for the whole app lifetime)
+    HLS_UPSTREAM_TIMEOUT: float = 30.0
+    HLS_MAX_CONNECTIONS: int = 200
+    HLS_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    HLS_KEEPALIVE_EXPIRY: float = 30.0
+    # Size of the chunks relayed to the client when streaming segments
+    HLS_STREAM_CHUNK_BYTES: int = 64 * 1024
+
+    # In-memory cache for immutable media segments (0 disables it)
+    HLS_SEGMENT_CACHE_BYTES: int = 256 * 1024 * 1024
+    HLS_SEGMENT_CACHE_MAX_ITEM_BYTES: int = 16 * 1024 * 1024
+
+    # Live playlists are cached for TTL_FRACTION * #EXT-X-TARGETDURATION, clamped to [MIN_TTL, MAX_TTL].
+    # Master playlists (no target duration) use DEFAULT_TTL. 0 entries disables the cache.
+    HLS_PLAYLIST_TTL_FRACTION: float = 0.5
+    HLS_PLAYLIST_DEFAULT_TTL: float = 2.0
+    HLS_PLAYLIST_MIN_TTL: float = 0.5
+    HLS_PLAYLIST_MAX_TTL: float = 5.0
+    HLS_PLAYLIST_CACHE_ENTRIES: int = 10000
+    # How many of the newest segments to warm into the segment cache when a playlist changes
+    HLS_PREFETCH_SEGMENTS: int = 1
+
     # Public base URL of this API (used to build playback URLs that proxy HLS through the API)
     PUBLIC_BASE_URL: str = "http://localhost:8000"
 
+    # Live chat push (WebSocket / SSE): per-subscriber buffer before a slow consumer is dropped
+    CHAT_SUBSCRIBER_QUEUE_SIZE: int = 256
+    CHAT_SSE_HEARTBEAT_SECONDS: float = 15.0
+
+    # Chat inserts are group-committed: collected for up to BATCH_WINDOW_MS or BATCH_MAX messages.
+    # "durable" acks the sender after the commit, "async" acks immediately (fire-and-forget).
+    CHAT_WRITE_MODE: str = "durable"
+    CHAT_BATCH_WINDOW_MS: float = 5.0
+    CHAT_BATCH_MAX: int = 256
+    CHAT_WRITE_TIMEOUT: float = 5.0
+
+    # Recent-chat ring buffer: last RING_SIZE messages for up to RING_MAX_STREAMS streams (0 disables it).
+    # A ring is compared with the stream's newest seq in the database at most every REFRESH_SECONDS,
+    # which bounds how long messages committed by other workers can be missing from it.
+    CHAT_RING_SIZE: int = 200
+    CHAT_RING_MAX_STREAMS: int = 5000
+    CHAT_RING_REFRESH_SECONDS: float = 2.0
+
+    # In-memory live-directory read model behind /home, /streams/live and /categories/samples.
+    # Each worker also reloads it from the database at most every REFRESH_SECONDS.
+    LIVE_DIRECTORY_ENABLED: bool = True
+    LIVE_DIRECTORY_REFRESH_SECONDS: float = 5.0
+
+    # Concurrent viewers estimated from /hls traffic: distinct clients per stream over the last
+    # WINDOW_SECONDS (HyperLogLog sketches, 2**PRECISION bytes per bucket). Every FLUSH_SECONDS
+    # each worker stores its sketches and writes the counts of all workers' merged sketches to the
+    # channel/stream rows
+    VIEWER_TRACKING_ENABLED: bool = True
+    VIEWER_WINDOW_SECONDS: float = 30.0
+    VIEWER_WINDOW_BUCKETS: int = 6
+    VIEWER_SKETCH_PRECISION: int = 10
+    VIEWER_FLUSH_SECONDS: float = 10.0
+    VIEWER_MAX_STREAMS: int = 10000
+    # Comma-separated addresses / networks of reverse proxies whose X-Forwarded-For is believed;
+    # from anyone else the connecting address identifies the viewer
+    TRUSTED_PROXIES: str = "127.0.0.1,::1"
+
+    # Clip views are counted in memory and added to clips.view_count every FLUSH_SECONDS
+    # (at most that much is lost on a crash); MAX_PENDING bounds distinct clips between flushes
+    CLIP_VIEW_FLUSH_SECONDS: float = 5.0
+    CLIP_VIEW_SHARDS: int = 16
+    CLIP_VIEW_MAX_PENDING: int = 100_000
+
+    # Category viewer/streamer totals are kept by deltas; recomputed from the live streams this often
+    CATEGORY_STATS_RECONCILE_SECONDS: float = 30.0
+
+    # Channel-id array behind /channels/recommended; full reload (ids only) at most this often
+    CHANNEL_SAMPLER_REFRESH_SECONDS: float = 300.0
+
     JWT_SECRET: str = "CHANGE_ME_DEV_ONLY"
     JWT_ALG: str = "HS256"
     ACCESS_TOKEN_MINUTES: int = 20
     REFRESH_TOKEN_DAYS: int = 7
     REFRESH_TOKEN_DAYS_REMEMBER: int = 30
 
+    # Argon2 cost. Stored hashes with other parameters are upgraded on the next successful login.
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536  # KiB
+    ARGON2_PARALLELISM: int = 4
+    # Password hashing process pool (0 workers hashes in the threadpool). At most WORKERS + MAX_QUEUE
+    # hash operations are admitted at once; the next caller gets a 503 right away.
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+
+    # Auth dependency caches: verified token claims (capped at the token's exp) and user rows.
+    # User entries are invalidated by writes in this worker; the TTL bounds staleness across workers.
+    AUTH_TOKEN_CACHE_SIZE: int = 100_000
+    AUTH_TOKEN_CACHE_TTL: float = 300.0
+    AUTH_USER_CACHE_SIZE: int = 100_000
+    AUTH_USER_CACHE_TTL: float = 30.0
+
+    # Per-user follow sets behind /follows/live; follow/unfollow drop the entry in this worker
+    FOLLOW_SET_CACHE_SIZE: int = 50_000
+    FOLLOW_SET_CACHE_TTL: float = 60.0
+
+    # /search applies the live-viewer boost to this many best text matches (at least offset + limit)
+    SEARCH_CANDIDATES: int = 1000
+
+    # ETag / 304 on public read endpoints, from per-family version counters stored in the database
+    # (entity_versions) and bumped in the transaction of each write. MAX_STALE_SECONDS is the responses' Cache-Control max-age (0: no-cache).
+    ETAG_ENABLED: bool = True
+    ETAG_MAX_STALE_SECONDS: float = 5.0
+
+    # Schema setup and seeding run once via `python -m app.db.init_db`, serialized by a lock file
+    # (empty: one per database file or URL in the temp directory). With
+    # AUTO_INIT_DB a worker that finds the schema missing or outdated runs it itself.
+    AUTO_INIT_DB: bool = True
+    INIT_DB_LOCK_FILE: str = ""
+
 settings = Settings()
@@ -1,9 +1,11 @@
-from typing import Generator, Optional
+from typing import AsyncGenerator, Generator, Optional
 from fastapi import Depends, HTTPException, Header
 from jose.exceptions import JWTError
 
-from app.db.session import SessionLocal
-from app.core.security import decode_token
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal, ReadSessionLocal, SessionLocal
+from app.core.auth_cache import load_user, load_user_async, verified_claims
 from app.models.user import User
 
 def get_db() -> Generator:
@@ -13,14 +15,30 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+def get_read_db() -> Generator:
+    """Session for endpoints that only read; in the production SQLite profile it can't write."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# The current user is resolved through the read session, so authenticating never takes the
+# writer connection; routes that modify the user load it into their own get_db session.
+
 def get_bearer_token(authorization: Optional[str] = Header(default=None)) -> str:
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing Bearer token")
     return authorization.split(" ", 1)[1].strip()
 
-def get_current_user(db=Depends(get_db), token: str = Depends(get_bearer_token)) -> User:
+def _token_subject(token: str) -> str:
+    """user_id of a valid access token; 401 otherwise."""
     try:
-        payload = decode_token(token)
+        payload = verified_claims(token)
         if payload.get("type") != "access":
             raise HTTPException(status_code=401, detail="Invalid token type")
         user_id = payload.get("sub")
@@ -28,31 +46,54 @@ def get_current_user(db=Depends(get_db), token: str = Depends(get_bearer_token))
             raise HTTPException(status_code=401, detail="Invalid token subject")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    return user_id
 
-    user = db.query(User).filter(User.user_id == user_id).first()
+def get_current_user(db=Depends(get_read_db), token: str = Depends(get_bearer_token)) -> User:
+    user = load_user(db, _token_subject(token))
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
 
-def get_current_user_optional(db=Depends(get_db), authorization: Optional[str] = Header(default=None)) -> Optional[User]:
-    """
-    Like get_current_user, but returns None when unauthenticated.
-    Use this for endpoints that are public but want to personalize responses.
-    """
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(get_bearer_token),
+) -> User:
+    """get_current_user for async routes: runs on the event loop, not the threadpool."""
+    user = await load_user_async(db, _token_subject(token))
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
+def _access_token_subject(authorization: Optional[str]) -> Optional[str]:
+    """user_id of a valid access token in the Authorization header, else None."""
     if not authorization or not authorization.lower().startswith("bearer "):
         return None
     token = authorization.split(" ", 1)[1].strip()
 
     try:
-        payload = decode_token(token)
+        payload = verified_claims(token)
         if payload.get("type") != "access":
             return None
-        user_id = payload.get("sub")
-        if not user_id:
-            return None
+        return payload.get("sub") or None
     except JWTError:
         return None
 
-    user = db.query(User).filter(User.user_id == user_id).first()
-    return user
+def get_current_user_optional(db=Depends(get_read_db), authorization: Optional[str] = Header(default=None)) -> Optional[User]:
+    """
+    Like get_current_user, but returns None when unauthenticated.
+    Use this for endpoints that are public but want to personalize responses.
+    """
+    user_id = _access_token_subject(authorization)
+    if user_id is None:
+        return None
+    return load_user(db, user_id)
 
+async def get_current_user_optional_async(
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = Header(default=None),
+) -> Optional[User]:
+    """get_current_user_optional for async routes: runs on the event loop, not the threadpool."""
+    user_id = _access_token_subject(authorization)
+    if user_id is None:
+        return None
+    return await load_user_async(db, user_id)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import secrets
+import threading
+from typing import Callable, Dict, Optional, Sequence
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.entity_version import EntityVersion
+
+FAMILIES = ("users", "channels", "streams", "categories", "clips")
+
+
+class VersionCounters:
+    """
+    One counter per entity family ("users", "channels", "streams", "categories", "clips").
+
+    The counters are rows of entity_versions: write paths call `bump` with their session before
+    committing, so a counter moves in the same transaction as the data and every worker sees it
+    (one primary-key read per conditional GET). An ETag is derived from the counters of the families
+    a response depends on and nothing else, so it changes exactly when one of them may have and a
+    client polling at any interval gets 304 until then. init_db starts each counter at a random
+    value, so a recreated database doesn't hand out old tags again.
+
+    Responses built from a per-process copy (category_stats) also change when that copy is
+    refreshed from the database; `touch` records that in a local counter, which goes into the tag
+    together with the per-boot id.
+    """
+
+    def __init__(self):
+        self.boot = secrets.token_hex(4)
+        self._local: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.reads = 0
+
+    def bump(self, db: Session, *families: str) -> None:
+        """Bumps `families` in the caller's transaction; the new tags show once it commits."""
+        t = EntityVersion.__table__
+        db.execute(update(t).where(t.c.family.in_(families)).values(version=t.c.version + 1))
+
+    def touch(self, *families: str) -> None:
+        with self._lock:
+            for family in families:
+                self._local[family] = self._local.get(family, 0) + 1
+
+    async def etag(self, families: Sequence[str]) -> str:
+        self.reads += 1
+        async with AsyncSessionLocal() as db:
+            stored = dict(
+                (await db.execute(
+                    select(EntityVersion.family, EntityVersion.version).where(EntityVersion.family.in_(families))
+                )).all()
+            )
+        tag = ".".join(str(stored.get(f, 0)) for f in families)
+        local = [str(self._local[f]) for f in families if f in self._local]
+        if local:
+            tag += f"-{self.boot}.{'.'.join(local)}"
+        return f'"{tag}"'
+
+    def stats(self) -> dict:
+        return {"reads": self.reads, "local": dict(self._local)}
+
+
+versions = VersionCounters()
+
+
+def _cache_control() -> str:
+    # Clients may reuse a response this long without asking; after that they revalidate with the tag
+    max_age = int(settings.ETAG_MAX_STALE_SECONDS)
+    return f"max-age={max_age}" if max_age > 0 else "no-cache"
+
+
+def _matches(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == tag:
+            return True
+    return False
+
+
+def conditional(*families: str) -> Callable[..., Dict[str, str]]:
+    """
+    Dependency for conditional GETs on data from `families`. Answers 304 (no body, one indexed
+    read) when the client's If-None-Match still matches; otherwise tags the response. Routes that return a
+    Response themselves must pass the returned headers on.
+    """
+    async def check(request: Request, response: Response) -> Dict[str, str]:
+        if not settings.ETAG_ENABLED:
+            return {}
+        # Taken before the route reads anything: a write racing this request leaves the client
+        # with an older tag, never a newer tag on older data
+        headers = {"ETag": await versions.etag(families), "Cache-Control": _cache_control()}
+        if _matches(request.headers.get("if-none-match"), headers["ETag"]):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return headers
+
+    return check
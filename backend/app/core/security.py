@@ -1,16 +1,89 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional, Tuple
+from fastapi import HTTPException
 from jose import jwt
 from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# Hashes made with other parameters still verify, and verify_and_update reports them for rehash
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=settings.ARGON2_TIME_COST,
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2__parallelism=settings.ARGON2_PARALLELISM,
+)
 
-def hash_password(password: str) -> str:
+# Argon2 runs in a dedicated, size-limited process pool so login bursts can't take every
+# threadpool worker (or the GIL) away from unrelated endpoints. Callers await the pool from the
+# event loop, so a queued hash holds no thread at all.
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+# Hash operations submitted and not finished; only touched from the event loop
+_hash_inflight = 0
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            # spawn: forking a process that already runs threads (server, chat writer) is unsafe
+            _hash_pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _hash_pool
+
+def shutdown_hash_pool() -> None:
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(wait=False, cancel_futures=True)
+            _hash_pool = None
+
+async def _run_hashing(fn: Callable, *args):
+    global _hash_inflight
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return await run_in_threadpool(fn, *args)
+
+    # Reject right away instead of queueing without bound when the pool is saturated
+    if _hash_inflight >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_QUEUE:
+        raise HTTPException(status_code=503, detail="Too many login attempts, please retry", headers={"Retry-After": "1"})
+    _hash_inflight += 1
+    try:
+        return await asyncio.wrap_future(_get_hash_pool().submit(fn, *args))
+    finally:
+        _hash_inflight -= 1
+
+def _hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def verify_password(password: str, password_hash: str) -> bool:
-    return pwd_context.verify(password, password_hash)
+def _verify_and_update(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, password_hash)
+
+def hash_password(password: str) -> str:
+    """Hashes inline; for scripts (seeding). Request handlers use hash_password_async."""
+    return _hash(password)
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(_hash, password)
+
+async def verify_and_update_password(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    """
+    Returns (valid, new_hash). new_hash is set when the stored hash was made with other
+    Argon2 parameters than the current settings and should replace it.
+    """
+    return await _run_hashing(_verify_and_update, password, password_hash)
+
+def hash_stats() -> dict:
+    return {
+        "inflight": _hash_inflight,
+        "capacity": settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_QUEUE,
+    }
 
 def create_token(subject: str, token_type: str, expires_delta: timedelta, extra: Optional[Dict[str, Any]] = None) -> str:
     now = datetime.now(timezone.utc)
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from fastapi.responses import ORJSONResponse
+
+
+@dataclass(frozen=True)
+class Nested:
+    """A nested object of a card, read from the same row; None when the `present` attribute is None."""
+    fields: Dict[str, Any]
+    present: Optional[str] = None
+
+
+def _flat_serializer(keys: tuple, paths: list) -> Callable[[Any], dict]:
+    if not keys:
+        return lambda obj: {}
+    get = attrgetter(*paths)
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda obj: {key: get(obj)}
+    return lambda obj: dict(zip(keys, get(obj)))
+
+
+def card_serializer(fields: Dict[str, Union[str, dict, Nested]]) -> Callable[[Any], dict]:
+    """
+    Compiles `{output key: attribute path}` into a function turning one object into a dict.
+
+    The attribute lookups become a single attrgetter, so serializing a card is one C call plus
+    a zip instead of a dict literal (and, later, FastAPI's jsonable_encoder walking it). A value
+    may also be a dict or a `Nested`, compiled the same way into a nested object; those come
+    after the plain fields, so the output keeps the order of `fields`.
+    """
+    keys, paths, children = [], [], []
+    for key, spec in fields.items():
+        if isinstance(spec, str):
+            if children:
+                raise ValueError(f"{key!r}: plain fields must come before nested objects")
+            keys.append(key)
+            paths.append(spec)
+            continue
+        if not isinstance(spec, Nested):
+            spec = Nested(spec)
+        present = attrgetter(spec.present) if spec.present else None
+        children.append((key, card_serializer(spec.fields), present))
+
+    flat = _flat_serializer(tuple(keys), paths)
+    if not children:
+        return flat
+
+    def serialize(obj: Any) -> dict:
+        out = flat(obj)
+        for key, child, present in children:
+            out[key] = child(obj) if present is None or present(obj) is not None else None
+        return out
+
+    return serialize
+
+
+def serialize_all(serializer: Callable[[Any], dict], objs: Iterable[Any]) -> List[dict]:
+    return list(map(serializer, objs))
+
+
+def json_response(content: Any, **kwargs: Any) -> ORJSONResponse:
+    """
+    Returns `content` encoded by orjson as is. Routes returning a Response skip FastAPI's
+    jsonable_encoder pass, so content must already be plain JSON types (datetimes are fine).
+    """
+    return ORJSONResponse(content, **kwargs)
+
+
+# Card shapes shared by the list endpoints
+
+# LiveCard -> /streams/live item
+LIVE_STREAM_CARD = card_serializer({
+    "stream_id": "stream_id",
+    "title": "title",
+    "thumbnail_url": "thumbnail_url",
+    "started_at": "started_at",
+    "channel_id": "channel_id",
+    "channel_username": "channel_username",
+    "channel_display_name": "channel_display_name",
+    "channel_avatar_url": "channel_avatar_url",
+    "current_viewer_count": "viewer_count",
+    "category_id": "category_id",
+    "category_name": "category_name",
+})
+
+# LiveCard -> /home "live" item
+HOME_STREAM_CARD = card_serializer({
+    "stream_id": "stream_id",
+    "title": "title",
+    "thumbnail_url": "thumbnail_url",
+    "started_at": "started_at",
+    "channel_id": "channel_id",
+    "channel_username": "channel_username",
+    "channel_display_name": "channel_display_name",
+    "channel_avatar_url": "channel_avatar_url",
+    "viewer_count": "viewer_count",
+    "category_id": "category_id",
+    "category_name": "category_name",
+})
+
+# LiveCard -> /categories/samples sample
+SAMPLE_STREAM_CARD = card_serializer({
+    "stream_id": "stream_id",
+    "title": "title",
+    "thumbnail_url": "thumbnail_url",
+    "started_at": "started_at",
+    "channel_username": "channel_username",
+    "channel_display_name": "channel_display_name",
+    "channel_avatar_url": "channel_avatar_url",
+    "viewer_count": "viewer_count",
+})
+
+# Clip page row (clip_service) -> /clips and /profile/{username}/clips item
+CLIP_CARD = card_serializer({
+    "clip_id": "clip_id",
+    "title": "title",
+    "thumbnail_url": "thumbnail_url",
+    "duration_seconds": "duration_seconds",
+    "view_count": "view_count",
+    "channel": Nested({
+        "username": "channel_username",
+        "display_name": "channel_display_name",
+        "avatar_url": "channel_avatar_url",
+    }, present="channel_username"),
+    "category": {
+        "category_id": "category_id",
+        "name": "category_name",
+    },
+})
+
+# Clip row -> /home "clips" item
+HOME_CLIP_CARD = card_serializer({
+    "clip_id": "clip_id",
+    "title": "title",
+    "thumbnail_url": "thumbnail_url",
+    "duration_seconds": "duration_seconds",
+    "view_count": "view_count",
+    "stream_id": "stream_id",
+    "channel_id": "channel_id",
+    "channel_username": "channel_username",
+    "channel_display_name": "channel_display_name",
+    "channel_avatar_url": "channel_avatar_url",
+    "category_id": "category_id",
+    "category_name": "category_name",
+})
+
+# Chat row -> /streams/{id}/chat item
+CHAT_ITEM = card_serializer({
+    "message_id": "message_id",
+    "stream_id": "stream_id",
+    "user_id": "user_id",
+    "username": "username",
+    "display_name": "display_name",
+    "avatar_url": "avatar_url",
+    "content": "content",
+    "created_at": "created_at",
+    "seq": "seq",
+})
+
+# CategoryAggregate -> /categories item
+CATEGORY_CARD = card_serializer({
+    "category_id": "category_id",
+    "name": "name",
+    "box_art": "box_art",
+    "viewer_count": "viewer_count",
+    "streamer_count": "streamer_count",
+})
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Wall time of each worker boot phase, logged once and kept for /metrics."""
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.total_ms = 0.0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + (time.perf_counter() - started) * 1000.0
+
+    def finish(self) -> None:
+        self.total_ms = (time.perf_counter() - self._started) * 1000.0
+        logger.info(
+            "startup took %.1f ms (%s)",
+            self.total_ms,
+            ", ".join(f"{name} {ms:.1f} ms" for name, ms in self.phases.items()),
+        )
+
+    def report(self) -> dict:
+        return {
+            "total_ms": round(self.total_ms, 3),
+            "phases_ms": {name: round(ms, 3) for name, ms in self.phases.items()},
+        }
+
+
+# Imported first by app.main, so the total covers the app's own imports
+startup = StartupTimer()
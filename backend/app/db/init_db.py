@@ -0,0 +1,196 @@
+"""
+One-time database setup: tables, indexes, the search index and the demo data.
+
+    cd backend && python -m app.db.init_db [--no-seed]
+
+Run it once per deploy, before the workers start. Workers only compare the schema fingerprint
+stored here with the one of the models they were built with (one SELECT, see check_schema); with
+AUTO_INIT_DB (the default, for local development) a worker that finds it missing or outdated runs
+init_db itself. A lock file per database (in the temp directory) makes concurrent callers wait for
+the first one instead of racing it.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import os
+import secrets
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from sqlalchemy import Column, String, Table, delete, insert, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from app.core.config import settings
+from app.core.etag import FAMILIES
+from app.db.base import Base
+from app.db.session import engine
+
+# Import models here to register them on Base.metadata (avoids circular import in db/base.py)
+from app.models.user import User  # noqa: F401
+from app.models.category import Category  # noqa: F401
+from app.models.channel import Channel  # noqa: F401
+from app.models.stream import Stream  # noqa: F401
+from app.models.clip import Clip  # noqa: F401
+from app.models.follow import Follow  # noqa: F401
+from app.models.chat_message import ChatMessage  # noqa: F401
+from app.models.entity_version import EntityVersion  # noqa: F401
+from app.models.viewer_sketch import ViewerSketch  # noqa: F401
+
+from app.services import search_index
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_KEY = "schema_fingerprint"
+
+app_meta = Table(
+    "app_meta",
+    Base.metadata,
+    Column("key", String, primary_key=True),
+    Column("value", String, nullable=False),
+)
+
+
+def schema_fingerprint() -> str:
+    """Hash of the tables, columns, indexes and search DDL the code expects."""
+    h = hashlib.sha256()
+    for table in Base.metadata.sorted_tables:
+        h.update(f"table {table.name}\n".encode())
+        for col in table.columns:
+            h.update(f"  {col.name} {col.type!r} {col.nullable} {col.primary_key}\n".encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            cols = ",".join(c.name for c in index.columns)
+            h.update(f"  index {index.name} {cols} {index.unique}\n".encode())
+    for ddl in search_index.DDL:
+        h.update(ddl.encode())
+    return h.hexdigest()[:16]
+
+
+def stored_fingerprint(bind: Engine) -> Optional[str]:
+    try:
+        with bind.connect() as conn:
+            return conn.execute(select(app_meta.c.value).where(app_meta.c.key == SCHEMA_KEY)).scalar()
+    except DBAPIError:
+        # No app_meta table yet: the database predates init_db or is empty
+        return None
+
+
+def check_schema(bind: Engine = engine) -> bool:
+    """True when init_db already ran against this database for the current models."""
+    return stored_fingerprint(bind) == schema_fingerprint()
+
+
+def _lock_path(bind: Engine) -> str:
+    """Lock file of one database, in the temp directory (not the working tree), named after its path or URL."""
+    if settings.INIT_DB_LOCK_FILE:
+        return settings.INIT_DB_LOCK_FILE
+    url = bind.url
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        # Every relative spelling of the same file gets the same lock
+        name = os.path.abspath(url.database)
+    else:
+        name = url.render_as_string(hide_password=False)
+    key = hashlib.sha256(name.encode()).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"devolo-init-{key}.lock")
+
+
+def _lock_file(f) -> None:
+    if os.name == "nt":
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after 10 seconds; keep waiting like flock does
+                continue
+    else:
+        fcntl.flock(f, fcntl.LOCK_EX)
+
+
+def _unlock_file(f) -> None:
+    if os.name == "nt":
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def _init_lock(bind: Engine) -> Iterator[None]:
+    path = _lock_path(bind)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a+") as f:
+        _lock_file(f)
+        try:
+            yield
+        finally:
+            _unlock_file(f)
+
+
+def _add_chat_seq(bind: Engine) -> None:
+    # chat_messages created before seq existed: add the column and number each stream's chat by created_at
+    if "seq" in {c["name"] for c in inspect(bind).get_columns("chat_messages")}:
+        return
+    with bind.begin() as conn:
+        conn.execute(text("ALTER TABLE chat_messages ADD COLUMN seq INTEGER"))
+        conn.execute(text(
+            "UPDATE chat_messages SET seq = n.rn FROM ("
+            " SELECT message_id, row_number() OVER (PARTITION BY stream_id ORDER BY created_at, message_id) AS rn"
+            " FROM chat_messages) AS n"
+            " WHERE chat_messages.message_id = n.message_id"
+        ))
+        conn.execute(text("DROP INDEX IF EXISTS ix_chat_messages_stream_created_id"))
+
+
+def init_db(seed: bool = True, bind: Engine = engine) -> bool:
+    """Creates or upgrades the schema (and seeds an empty database); False if nothing had to change."""
+    from app.seed.seed_data import seed_if_empty
+
+    with _init_lock(bind):
+        # Whoever held the lock before us may have done the work already
+        fingerprint = schema_fingerprint()
+        changed = stored_fingerprint(bind) != fingerprint
+        if changed:
+            Base.metadata.create_all(bind=bind)
+            _add_chat_seq(bind)
+            # create_all skips tables that already exist, so indexes added to existing models are created here
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(bind=bind, checkfirst=True)
+            search_index.ensure_search_index(bind)
+            with bind.begin() as conn:
+                # create_all doesn't alter existing tables: clean up values that newer columns forbid
+                conn.execute(update(Clip).where(Clip.view_count.is_(None)).values(view_count=0))
+                # ETag counters start anywhere, so tags of a recreated database don't repeat old ones
+                existing = set(conn.execute(select(EntityVersion.family)).scalars())
+                missing = [f for f in FAMILIES if f not in existing]
+                if missing:
+                    conn.execute(insert(EntityVersion), [{"family": f, "version": secrets.randbelow(2**30)} for f in missing])
+                conn.execute(delete(app_meta).where(app_meta.c.key == SCHEMA_KEY))
+                conn.execute(insert(app_meta).values(key=SCHEMA_KEY, value=fingerprint))
+            logger.info("database schema initialized (%s)", fingerprint)
+        if seed:
+            seed_if_empty()
+    return changed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create the database schema and seed demo data.")
+    parser.add_argument("--no-seed", action="store_true", help="skip the demo data")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    changed = init_db(seed=not args.no_seed)
+    print("schema initialized" if changed else "schema already up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,82 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
+# Async driver used for each sync driver when ASYNC_DATABASE_URL is not set explicitly
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def _is_memory(url: str) -> bool:
+    return make_url(url).database in (None, "", ":memory:")
+
+def _pool_args(url: str, is_async: bool = False) -> dict:
+    # In-memory SQLite uses a single static connection, where pool sizing doesn't apply
+    if _is_memory(url):
+        return {}
+    args = {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW}
+    if is_async:
+        # aiosqlite otherwise defaults to NullPool (a new connection per checkout)
+        args["poolclass"] = AsyncAdaptedQueuePool
+    return args
+
+def async_database_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    driver = _ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"No async driver known for {url.drivername}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+def _sqlite_pragmas(read_only: bool):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return on_connect
+
+def _use_pragmas(engine: Engine, read_only: bool) -> None:
+    event.listen(engine, "connect", _sqlite_pragmas(read_only))
+
+# Production SQLite: WAL lets readers run alongside the one writer, so reads get their own pooled
+# read-only engine and every write goes through a single connection instead of fighting over the lock
+SQLITE_PRODUCTION = (
+    settings.DB_PROFILE == "production"
+    and make_url(settings.DATABASE_URL).get_backend_name() == "sqlite"
+    and not _is_memory(settings.DATABASE_URL)
+)
+
 connect_args = {"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(settings.DATABASE_URL, connect_args=connect_args, future=True)
+if SQLITE_PRODUCTION:
+    engine = create_engine(
+        settings.DATABASE_URL, connect_args=connect_args, future=True,
+        pool_size=1, max_overflow=0, pool_timeout=settings.DB_WRITER_TIMEOUT,
+    )
+    _use_pragmas(engine, read_only=False)
+    read_engine = create_engine(settings.DATABASE_URL, connect_args=connect_args, future=True, **_pool_args(settings.DATABASE_URL))
+    _use_pragmas(read_engine, read_only=True)
+else:
+    engine = create_engine(settings.DATABASE_URL, connect_args=connect_args, future=True, **_pool_args(settings.DATABASE_URL))
+    read_engine = engine
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
+# For read-only dependencies; the same as SessionLocal outside production SQLite
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine, future=True)
+
+# Async engine for the hot read routes; the driver (aiosqlite / asyncpg) is only loaded here
+async_engine = create_async_engine(async_database_url(), **_pool_args(settings.DATABASE_URL, is_async=True))
+if SQLITE_PRODUCTION:
+    _use_pragmas(async_engine.sync_engine, read_only=True)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
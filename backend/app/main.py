@@ -1,36 +1,68 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+from app.core.startup import startup
 
-from app.api.router import api_router
-from app.db.session import engine
-from app.db.base import Base
+with startup.phase("imports"):
+    from contextlib import asynccontextmanager
 
-# Import models here to register them on Base.metadata (avoids circular import in db/base.py)
-from app.models.user import User  # noqa: F401
-from app.models.category import Category  # noqa: F401
-from app.models.channel import Channel  # noqa: F401
-from app.models.stream import Stream  # noqa: F401
-from app.models.clip import Clip  # noqa: F401
-from app.models.follow import Follow  # noqa: F401
-from app.models.chat_message import ChatMessage  # noqa: F401
+    from fastapi import FastAPI
+    from fastapi.responses import ORJSONResponse
+    from fastapi.middleware.cors import CORSMiddleware
 
-from app.seed.seed_data import seed_if_empty
+    from app.core.config import settings
+
+with startup.phase("engine"):
+    from app.db.session import async_engine, engine
+    from app.db.init_db import check_schema, init_db
+
+with startup.phase("route_imports"):
+    from app.api.router import api_router
+    from app.core.security import shutdown_hash_pool
+    from app.services import hls_service
+    from app.services.chat_writer import chat_writer
+    from app.services.clip_views import clip_views
+    from app.services.search_index import detect_search_index
+    from app.services.viewer_tracker import viewer_tracker
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    chat_writer.start()
+    viewer_tracker.start()
+    clip_views.start()
+    yield
+    clip_views.stop()
+    viewer_tracker.stop()
+    chat_writer.stop()
+    await hls_service.close_client()
+    shutdown_hash_pool()
+    await async_engine.dispose()
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="DEVOLO API", version="0.1.0")
+    # Schema setup and seeding belong to `python -m app.db.init_db`; a worker only checks that it ran
+    with startup.phase("schema_check"):
+        schema_ok = check_schema(engine)
+    if not schema_ok:
+        if not settings.AUTO_INIT_DB:
+            raise RuntimeError("database schema is missing or outdated; run `python -m app.db.init_db`")
+        with startup.phase("init_db"):
+            init_db()
+    with startup.phase("search_index_check"):
+        detect_search_index(engine)
+
+    with startup.phase("router_build"):
+        app = FastAPI(title="DEVOLO API", version="0.1.0", lifespan=lifespan, default_response_class=ORJSONResponse)
 
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["http://localhost:5173"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=["http://localhost:5173"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+            # Clip listings return their next-page cursor in a header
+            expose_headers=["X-Next-Cursor"],
+        )
 
-    Base.metadata.create_all(bind=engine)
-    seed_if_empty()
+        app.include_router(api_router)
 
-    app.include_router(api_router)
+    startup.finish()
     return app
 
 app = create_app()
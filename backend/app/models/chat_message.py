@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Index, Integer
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -18,6 +18,15 @@ class ChatMessage(Base):
     content = Column(Text, nullable=False)
 
     created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), server_default=func.current_timestamp(), index=True)
+    # Position in the stream's chat, assigned in commit order by the chat writer's INSERT
+    seq = Column(Integer, nullable=False)
 
     user = relationship("User")
     stream = relationship("Stream")
+
+    __table_args__ = (
+        # Keyset pagination of a stream's chat, and the next seq (max + 1)
+        Index("ix_chat_messages_stream_seq", "stream_id", "seq", unique=True),
+        # ?since= (a timestamp) of older clients
+        Index("ix_chat_messages_stream_created", "stream_id", "created_at"),
+    )
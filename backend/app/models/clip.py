@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base import Base
@@ -15,10 +15,17 @@ class Clip(Base):
     thumbnail_url = Column(Text)
 
     duration_seconds = Column(Integer, nullable=False)
-    view_count = Column(Integer, default=0, index=True)
+    # NOT NULL: the listings paginate by (view_count, clip_id), and NULL never compares
+    view_count = Column(Integer, default=0, server_default="0", nullable=False, index=True)
 
     created_at = Column(DateTime, server_default=func.current_timestamp())
     published_at = Column(DateTime)
 
     creator = relationship("User")
     stream = relationship("Stream")
+
+    __table_args__ = (
+        # Keyset pagination of the clip listings by (view_count, clip_id), overall and per creator
+        Index("ix_clips_view_count_clip_id", "view_count", "clip_id"),
+        Index("ix_clips_creator_view_count_clip_id", "creator_id", "view_count", "clip_id"),
+    )
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String
+
+from app.db.base import Base
+
+
+class EntityVersion(Base):
+    """Change counter of one entity family, bumped in the transaction of every write to it (see app.core.etag)."""
+    __tablename__ = "entity_versions"
+
+    family = Column(String(20), primary_key=True)
+    version = Column(Integer, nullable=False)
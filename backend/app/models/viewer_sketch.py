@@ -0,0 +1,13 @@
+from sqlalchemy import Column, DateTime, LargeBinary, String
+
+from app.db.base import Base
+
+
+class ViewerSketch(Base):
+    """One worker's HyperLogLog of a stream's recent viewers, merged with the others' on flush (see viewer_tracker)."""
+    __tablename__ = "viewer_sketches"
+
+    stream_key = Column(String(64), primary_key=True)
+    worker_id = Column(String(32), primary_key=True)
+    registers = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, nullable=False, index=True)
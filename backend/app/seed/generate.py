@@ -0,0 +1,347 @@
+"""
+Synthetic data at production scale, for load tests and benchmarks.
+
+    cd backend && DATABASE_URL=sqlite:///./load.db python -m app.seed.generate \\
+        --users 1000000 --live 5000 --chat 20000000 --seed 1
+
+Rows go through Core executemany inserts in batches (no ORM objects), and each table's
+secondary indexes are dropped during its load and rebuilt afterwards. Everything is derived from
+--seed: ids are hashes of (seed, kind, index) and every table draws from its own RNG, so the same
+seed gives the same data, and changing one table's count doesn't reshuffle the others. Timestamps
+are relative to the time of the run.
+
+Shape of the data:
+- follows: each user follows an exponentially distributed number of others (mean --follows),
+  picked by a Zipf law over users, so a few users have most of the followers; follower_count
+  matches the rows
+- channels belong to the most followed users; --live of them are live with Pareto-distributed
+  viewer counts, and category totals match the live streams
+- chat rows land on live streams in proportion to their viewers
+- all users share one password (hashed once): password123
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import random
+import time
+from array import array
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, islice
+from typing import Iterable, Iterator, List
+
+from sqlalchemy import Table, bindparam, func, select, text, update
+
+from app.core.security import pwd_context
+from app.db.init_db import init_db
+from app.db.session import engine
+from app.models.category import Category
+from app.models.channel import Channel
+from app.models.chat_message import ChatMessage
+from app.models.clip import Clip
+from app.models.follow import Follow
+from app.models.stream import Stream
+from app.models.user import User
+from app.seed.seed_data import BOX, CLIPTH, THUMBS
+from app.services.chat_history import naive_utc
+from app.services.search_index import rebuild_search_index
+
+PASSWORD = "password123"
+
+# RFC 4122 variant bits (10xx) in the first hex digit of the fourth group
+_VARIANT = {c: "89ab"[int(c, 16) & 3] for c in "0123456789abcdef"}
+
+CHAT_LINES = [
+    "gg", "no way", "that was clean", "LUL", "first time here, love the stream",
+    "what settings are you on?", "clip it!", "hype", "F", "let's gooo",
+    "how long have you been streaming today?", "W", "monkaS", "nice one",
+]
+
+
+class Generator:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.seed = args.seed
+        self.batch = args.batch
+        self.now = naive_utc(datetime.now(timezone.utc))
+
+        n_users = args.users
+        self.channels = min(args.channels if args.channels is not None else n_users // 10, n_users)
+        self.live = min(args.live, self.channels)
+
+        # Channel plan, shared by categories, channels and streams
+        rng = self.rng("channels")
+        category_weights = _zipf_cum(args.categories, 1.0)
+        self.channel_category = array("l", (_pick(rng, category_weights) for _ in range(self.channels)))
+        self.live_channels: List[int] = sorted(rng.sample(range(self.channels), self.live))
+        self.live_viewers = {c: min(args.max_viewers, int(rng.paretovariate(1.1) * 3)) for c in self.live_channels}
+        self.live_started = {c: self.now - timedelta(minutes=rng.uniform(5, 8 * 60)) for c in self.live_channels}
+
+        # Every other table points at users, so their ids are computed once (~100 bytes per user)
+        self.user_ids = [self.id("user", i) for i in range(n_users)]
+
+    def rng(self, kind: str) -> random.Random:
+        return random.Random(f"{self.seed}:{kind}")
+
+    def id(self, kind: str, i: int) -> str:
+        """A version-4 shaped UUID string; built by hand since uuid.UUID costs more than the hash."""
+        h = hashlib.blake2b(f"{self.seed}:{kind}:{i}".encode(), digest_size=16).hexdigest()
+        return f"{h[:8]}-{h[8:12]}-4{h[13:16]}-{_VARIANT[h[16]]}{h[17:20]}-{h[20:]}"
+
+    # Loading
+
+    def load(self, table: Table, rows: Iterable[dict]) -> int:
+        started = time.perf_counter()
+        total = 0
+        with _without_indexes(table):
+            it = iter(rows)
+            while True:
+                chunk = list(islice(it, self.batch))
+                if not chunk:
+                    break
+                with engine.begin() as conn:
+                    conn.execute(table.insert(), chunk)
+                total += len(chunk)
+        _report(table.name, total, started)
+        return total
+
+    def run(self) -> None:
+        self.load(Category.__table__, self.categories())
+        self.load(User.__table__, self.users())
+        self.load(Channel.__table__, self.channel_rows())
+        self.load(Stream.__table__, self.streams())
+        self.load(Clip.__table__, self.clips())
+        self.load(Follow.__table__, self.follows())
+        self.update_follower_counts()
+        self.load(ChatMessage.__table__, self.chat())
+
+        started = time.perf_counter()
+        rebuild_search_index(engine)
+        if engine.dialect.name == "sqlite":
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE"))
+        _report("search index + analyze", 0, started)
+
+    # Tables
+
+    def categories(self) -> Iterator[dict]:
+        viewers = [0] * self.args.categories
+        streamers = [0] * self.args.categories
+        for c in self.live_channels:
+            viewers[self.channel_category[c]] += self.live_viewers[c]
+            streamers[self.channel_category[c]] += 1
+        for i in range(self.args.categories):
+            yield {
+                "category_id": self.id("category", i),
+                "name": f"Category {i:04d}",
+                "box_art": BOX[i % len(BOX)],
+                "viewer_count": viewers[i],
+                "streamer_count": streamers[i],
+            }
+
+    def users(self) -> Iterator[dict]:
+        password_hash = pwd_context.hash(PASSWORD)
+        for i in range(self.args.users):
+            username = f"user{i:07d}"
+            yield {
+                "user_id": self.user_ids[i],
+                "username": username,
+                "email": f"{username}@example.com",
+                "password_hash": password_hash,
+                "display_name": f"User {i}",
+                "avatar_url": f"https://api.dicebear.com/7.x/thumbs/svg?seed={username}",
+                "banner_url": THUMBS[i % len(THUMBS)],
+                "bio": "Synthetic load-test user.",
+                "created_at": self.now,
+                "follower_count": 0,
+            }
+
+    def channel_rows(self) -> Iterator[dict]:
+        # User i is the i-th most followed, so the channels belong to the popular users
+        for i in range(self.channels):
+            live = i in self.live_viewers
+            yield {
+                "channel_id": self.id("channel", i),
+                "user_id": self.user_ids[i],
+                "stream_key": self.id("stream_key", i),
+                "title": f"User {i} on DEVOLO",
+                "current_category": self.id("category", self.channel_category[i]),
+                "live_thumbnail_url": THUMBS[i % len(THUMBS)],
+                "is_live": live,
+                "current_viewer_count": self.live_viewers.get(i, 0),
+                "last_live_at": self.live_started[i] if live else None,
+                "created_at": self.now,
+            }
+
+    def streams(self) -> Iterator[dict]:
+        rng = self.rng("streams")
+        # Live streams first, so stream j < live is the j-th live channel's
+        for j, c in enumerate(self.live_channels):
+            viewers = self.live_viewers[c]
+            yield self._stream(j, c, f"Live now #{j}", self.live_started[c], None, int(viewers * rng.uniform(1.0, 1.5)), viewers)
+        if not self.channels:
+            return
+        for j in range(self.live, self.live + self.args.ended_streams):
+            c = rng.randrange(self.channels)
+            started = self.now - timedelta(days=rng.uniform(1, 30))
+            ended = started + timedelta(hours=rng.uniform(1, 6))
+            peak = min(self.args.max_viewers, int(rng.paretovariate(1.1) * 3))
+            yield self._stream(j, c, f"Past broadcast #{j}", started, ended, peak, int(peak * rng.uniform(0.4, 0.9)))
+
+    def _stream(self, j: int, c: int, title: str, started: datetime, ended, peak: int, avg: int) -> dict:
+        return {
+            "stream_id": self.id("stream", j),
+            "channel_id": self.id("channel", c),
+            "category_id": self.id("category", self.channel_category[c]),
+            "title": title,
+            "thumbnail_url": THUMBS[j % len(THUMBS)],
+            "started_at": started,
+            "ended_at": ended,
+            "peak_viewers": peak,
+            "average_viewers": avg,
+            "stream_server": "placeholder",
+            "stream_key": self.id("stream_key", c),
+        }
+
+    def clips(self) -> Iterator[dict]:
+        rng = self.rng("clips")
+        n_streams = self.live + self.args.ended_streams if self.channels else 0
+        if not n_streams:
+            return
+        for i in range(self.args.clips):
+            yield {
+                "clip_id": self.id("clip", i),
+                "stream_id": self.id("stream", rng.randrange(n_streams)),
+                "creator_id": rng.choice(self.user_ids),
+                "title": f"Clip {i}",
+                "clip_url": "https://example.com/clip.mp4",
+                "thumbnail_url": CLIPTH[i % len(CLIPTH)],
+                "duration_seconds": rng.randint(5, 60),
+                "view_count": min(10_000_000, int(rng.paretovariate(1.16) * 10)),
+                "created_at": self.now,
+            }
+
+    def follows(self) -> Iterator[dict]:
+        rng = self.rng("follows")
+        n = self.args.users
+        cum = _zipf_cum(n, self.args.follow_alpha)
+        self.follower_counts = array("l", bytes(array("l").itemsize * n))
+        k = 0
+        for follower in range(n):
+            want = min(n - 1, self.args.max_follows, int(rng.expovariate(1.0 / self.args.follows))) if self.args.follows > 0 else 0
+            targets = set()
+            # Popular users get drawn repeatedly; a few rounds, then settle for fewer
+            for _ in range(4):
+                if len(targets) >= want:
+                    break
+                for _ in range(want - len(targets)):
+                    t = _pick(rng, cum)
+                    if t != follower:
+                        targets.add(t)
+            for t in sorted(targets):
+                self.follower_counts[t] += 1
+                yield {
+                    "follow_id": self.id("follow", k),
+                    "follower_id": self.user_ids[follower],
+                    "followed_user_id": self.user_ids[t],
+                    "created_at": self.now,
+                }
+                k += 1
+
+    def update_follower_counts(self) -> None:
+        started = time.perf_counter()
+        t = User.__table__
+        stmt = update(t).where(t.c.user_id == bindparam("uid")).values(follower_count=bindparam("n"))
+        rows = ({"uid": self.user_ids[i], "n": n} for i, n in enumerate(self.follower_counts) if n)
+        total = 0
+        while True:
+            chunk = list(islice(rows, self.batch))
+            if not chunk:
+                break
+            with engine.begin() as conn:
+                conn.execute(stmt, chunk)
+            total += len(chunk)
+        _report("users.follower_count", total, started)
+
+    def chat(self) -> Iterator[dict]:
+        if not self.live:
+            return
+        rng = self.rng("chat")
+        # Busier streams get more chat
+        cum = list(accumulate(self.live_viewers[c] + 1 for c in self.live_channels))
+        seqs = [0] * len(self.live_channels)
+        for i in range(self.args.chat):
+            j = _pick(rng, cum)
+            started = self.live_started[self.live_channels[j]]
+            seqs[j] += 1
+            yield {
+                "message_id": self.id("chat", i),
+                "stream_id": self.id("stream", j),
+                "user_id": rng.choice(self.user_ids),
+                "content": rng.choice(CHAT_LINES),
+                # Later lines are later in every stream, so seq and created_at agree
+                "created_at": started + (self.now - started) * ((i + rng.random()) / self.args.chat),
+                "seq": seqs[j],
+            }
+
+
+def _zipf_cum(n: int, alpha: float) -> List[float]:
+    """Cumulative weights of ranks 0..n-1 with P(rank r) proportional to 1 / (r + 1) ** alpha."""
+    return list(accumulate(1.0 / (r ** alpha) for r in range(1, n + 1)))
+
+
+def _pick(rng: random.Random, cum: List[float]) -> int:
+    return bisect(cum, rng.random() * cum[-1])
+
+
+@contextmanager
+def _without_indexes(table: Table) -> Iterator[None]:
+    # Building an index once over the loaded rows beats updating it on every insert
+    for index in table.indexes:
+        index.drop(bind=engine, checkfirst=True)
+    try:
+        yield
+    finally:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def _report(name: str, rows: int, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    rate = f"{rows / elapsed:>12,.0f} rows/s" if rows and elapsed > 0 else ""
+    print(f"{name:<24}{rows:>14,}{elapsed:>9.1f}s{rate}", flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a large synthetic dataset into an empty database.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--categories", type=int, default=200)
+    parser.add_argument("--channels", type=int, default=None, help="default: a tenth of the users")
+    parser.add_argument("--live", type=int, default=2_000, help="channels live right now")
+    parser.add_argument("--ended-streams", type=int, default=20_000)
+    parser.add_argument("--clips", type=int, default=100_000)
+    parser.add_argument("--follows", type=float, default=20.0, help="mean follows per user")
+    parser.add_argument("--max-follows", type=int, default=2_000)
+    parser.add_argument("--follow-alpha", type=float, default=1.0, help="Zipf exponent of follow targets")
+    parser.add_argument("--max-viewers", type=int, default=200_000)
+    parser.add_argument("--chat", type=int, default=1_000_000, help="chat messages on live streams")
+    parser.add_argument("--batch", type=int, default=20_000, help="rows per executemany/transaction")
+    args = parser.parse_args()
+    if args.users <= 0 or args.categories <= 0:
+        parser.error("--users and --categories must be positive")
+
+    init_db(seed=False)
+    with engine.connect() as conn:
+        if conn.execute(select(func.count()).select_from(User.__table__)).scalar():
+            raise SystemExit("the database already has users; point DATABASE_URL at a new file")
+
+    started = time.perf_counter()
+    Generator(args).run()
+    print(f"done in {time.perf_counter() - started:.1f}s; every user's password is {PASSWORD!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -43,14 +43,15 @@ def seed_if_empty():
         db.add_all(categories)
         db.commit()
 
-        # Users
+        # Users (all share the demo password, so it is hashed once)
+        password_hash = hash_password("password123")
         users = []
         for i, uname in enumerate(["neonwolf", "charcoalqueen", "pinkpulse", "emeraldbyte"]):
             users.append(User(
                 user_id=str(uuid.uuid4()),
                 username=uname,
                 email=f"{uname}@example.com",
-                password_hash=hash_password("password123"),
+                password_hash=password_hash,
                 display_name=uname.title(),
                 avatar_url=f"https://api.dicebear.com/7.x/thumbs/svg?seed={uname}",
                 banner_url=THUMBS[i % len(THUMBS)],
@@ -1,41 +1,84 @@
 import uuid
 from datetime import datetime, timezone
+from typing import Optional
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
 
-from app.core.security import hash_password, verify_password, access_token, refresh_token
+from app.core.auth_cache import invalidate_user
+from app.core.security import hash_password_async, verify_and_update_password, access_token, refresh_token
+from app.db.session import AsyncSessionLocal, SessionLocal
 from app.models.user import User
 
-def register_user(db: Session, username: str, email: str, password: str, display_name: str | None):
-    exists = db.query(User).filter((User.username == username) | (User.email == email)).first()
+# Argon2 runs with no database connection held: the lookups go through a short async read
+# session, the hash is awaited, and the write gets its own short writer session afterwards.
+
+async def register_user(username: str, email: str, password: str, display_name: str | None) -> str:
+    async with AsyncSessionLocal() as db:
+        exists = (await db.execute(
+            select(User.user_id).where(or_(User.username == username, User.email == email)).limit(1)
+        )).first()
     if exists:
         raise HTTPException(status_code=400, detail="Username or email already exists")
 
-    u = User(
-        user_id=str(uuid.uuid4()),
-        username=username,
-        email=email,
-        password_hash=hash_password(password),
-        display_name=display_name,
-        avatar_url=None,
-        banner_url=None,
-        bio="",
-        follower_count=0,
-    )
-    db.add(u)
-    db.commit()
-    db.refresh(u)
-    return u
-
-def login(db: Session, email: str, password: str, remember_me: bool):
-    u = db.query(User).filter(User.email == email).first()
-    if not u or not verify_password(password, u.password_hash):
+    password_hash = await hash_password_async(password)
+    user_id = str(uuid.uuid4())
+    await run_in_threadpool(_insert_user, user_id, username, email, password_hash, display_name)
+    return user_id
+
+def _insert_user(user_id: str, username: str, email: str, password_hash: str, display_name: str | None) -> None:
+    db = SessionLocal()
+    try:
+        db.add(User(
+            user_id=user_id,
+            username=username,
+            email=email,
+            password_hash=password_hash,
+            display_name=display_name,
+            avatar_url=None,
+            banner_url=None,
+            bio="",
+            follower_count=0,
+        ))
+        db.commit()
+    except IntegrityError:
+        # Registered by a concurrent request while we were hashing
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Username or email already exists")
+    finally:
+        db.close()
+
+async def login(email: str, password: str, remember_me: bool):
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(select(User.user_id, User.password_hash).where(User.email == email))).first()
+    if not row:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    user_id, password_hash = row
+
+    valid, new_hash = await verify_and_update_password(password, password_hash)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    await run_in_threadpool(_record_login, user_id, new_hash)
+    return issue_tokens(user_id, remember_me=remember_me)
 
-    u.last_login = datetime.now(timezone.utc)
-    db.commit()
+def _record_login(user_id: str, new_hash: Optional[str]) -> None:
+    values = {"last_login": datetime.now(timezone.utc)}
+    # Transparent rehash when the Argon2 parameters changed since this hash was made
+    if new_hash:
+        values["password_hash"] = new_hash
+    db = SessionLocal()
+    try:
+        db.execute(update(User).where(User.user_id == user_id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+    if new_hash:
+        invalidate_user(user_id)
 
+def issue_tokens(user_id: str, remember_me: bool):
     return {
-        "access_token": access_token(u.user_id),
-        "refresh_token": refresh_token(u.user_id, remember_me=remember_me),
+        "access_token": access_token(user_id),
+        "refresh_token": refresh_token(user_id, remember_me=remember_me),
     }
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, case, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.etag import versions
+from app.db.session import SessionLocal
+from app.models.category import Category
+from app.models.channel import Channel
+from app.models.stream import Stream
+
+logger = logging.getLogger(__name__)
+
+# category_id -> (viewer delta, streamer delta)
+Deltas = Dict[str, Tuple[int, int]]
+
+
+@dataclass
+class CategoryAggregate:
+    category_id: str
+    name: str
+    box_art: Optional[str]
+    viewer_count: int = 0
+    streamer_count: int = 0
+
+
+def add_delta(deltas: Deltas, category_id: Optional[str], viewers: int = 0, streamers: int = 0) -> None:
+    if category_id is None or (viewers == 0 and streamers == 0):
+        return
+    v, s = deltas.get(category_id, (0, 0))
+    deltas[category_id] = (v + viewers, s + streamers)
+
+
+def apply_deltas_sql(db: Session, deltas: Deltas) -> None:
+    """Adds the deltas to Category.viewer_count / streamer_count in the caller's transaction."""
+    if not deltas:
+        return
+    t = Category.__table__
+
+    def clamped(column, delta):
+        value = func.coalesce(column, 0) + bindparam(delta)
+        return case((value < 0, 0), else_=value)
+
+    stmt = (
+        update(t)
+        .where(t.c.category_id == bindparam("cid"))
+        .values(viewer_count=clamped(t.c.viewer_count, "dv"), streamer_count=clamped(t.c.streamer_count, "ds"))
+    )
+    db.execute(stmt, [{"cid": cid, "dv": dv, "ds": ds} for cid, (dv, ds) in deltas.items()])
+    versions.bump(db, "categories")
+
+
+class CategoryStats:
+    """
+    Viewer and streamer totals per category, maintained incrementally.
+
+    Stream start/stop and viewer-count flushes add their deltas to the Category columns in the
+    same transaction as the change itself (see apply_deltas_sql) and then to this in-memory copy,
+    which keeps the ranking for /categories and /categories/samples. At most every
+    `reconcile_seconds` the totals are recomputed from the live streams with one GROUP BY; that
+    corrects drift here (e.g. changes made by other workers) and, with a compare-and-set UPDATE
+    from a background thread, in the stored columns.
+    """
+
+    def __init__(self, reconcile_seconds: float):
+        self.reconcile_seconds = reconcile_seconds
+        self._cats: Dict[str, CategoryAggregate] = {}
+        self._ranked: Optional[List[CategoryAggregate]] = None
+        self._reconciled_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._correct_lock = threading.Lock()
+
+        self.reconciles = 0
+        self.deltas_applied = 0
+        self.drift_corrections = 0
+
+    def ensure_fresh(self, db: Session) -> None:
+        reconciled_at = self._reconciled_at
+        if reconciled_at is not None and time.monotonic() - reconciled_at < self.reconcile_seconds:
+            return
+        # Same as the live directory: one reconcile at a time, others keep the current ranking
+        if not self._reload_lock.acquire(blocking=reconciled_at is None):
+            return
+        try:
+            if self._reconciled_at != reconciled_at:
+                return
+            self.reconcile(db)
+        finally:
+            self._reload_lock.release()
+
+    def reconcile(self, db: Session) -> None:
+        live = {
+            cid: (int(viewers or 0), int(streamers))
+            for cid, streamers, viewers in db.execute(
+                select(Stream.category_id, func.count(), func.sum(Channel.current_viewer_count))
+                .join(Channel, Channel.channel_id == Stream.channel_id)
+                .where(Channel.is_live == True, Stream.ended_at.is_(None), Stream.category_id.is_not(None))
+                .group_by(Stream.category_id)
+            ).all()
+        }
+        cats: Dict[str, CategoryAggregate] = {}
+        stale = []
+        for cid, name, box_art, stored_v, stored_s in db.execute(
+            select(Category.category_id, Category.name, Category.box_art, Category.viewer_count, Category.streamer_count)
+        ).all():
+            v, s = live.get(cid, (0, 0))
+            cats[cid] = CategoryAggregate(cid, name, box_art, v, s)
+            if (stored_v or 0, stored_s or 0) != (v, s):
+                stale.append({"cid": cid, "v": v, "s": s, "old_v": stored_v, "old_s": stored_s})
+
+        with self._lock:
+            if cats != self._cats:
+                versions.touch("categories")
+            self._cats = cats
+            self._ranked = None
+            self._reconciled_at = time.monotonic()
+            self.reconciles += 1
+
+        # Reconciles run on GET requests, which must not wait for the writer connection: the
+        # correction goes to a background thread, one at a time (a skipped one is redone later)
+        if stale and self._correct_lock.acquire(blocking=False):
+            threading.Thread(target=self._correct_stored, args=(stale,), name="category-correct", daemon=True).start()
+
+    def _correct_stored(self, rows: List[dict]) -> None:
+        # Only overwrite rows nobody changed since we read them; a concurrent delta wins and
+        # anything still off is picked up by the next reconcile
+        t = Category.__table__
+        stmt = (
+            update(t)
+            .where(
+                t.c.category_id == bindparam("cid"),
+                func.coalesce(t.c.viewer_count, 0) == func.coalesce(bindparam("old_v"), 0),
+                func.coalesce(t.c.streamer_count, 0) == func.coalesce(bindparam("old_s"), 0),
+            )
+            .values(viewer_count=bindparam("v"), streamer_count=bindparam("s"))
+        )
+        db = SessionLocal()
+        try:
+            db.execute(stmt, rows)
+            db.commit()
+            self.drift_corrections += len(rows)
+        except Exception:
+            db.rollback()
+            logger.exception("correcting %d category aggregates failed", len(rows))
+        finally:
+            db.close()
+            self._correct_lock.release()
+
+    def apply(self, deltas: Deltas) -> None:
+        """Applies deltas that were committed with apply_deltas_sql."""
+        if not deltas:
+            return
+        with self._lock:
+            for cid, (dv, ds) in deltas.items():
+                agg = self._cats.get(cid)
+                if agg is None:
+                    # Not loaded yet or a new category; the next reconcile brings it in
+                    continue
+                agg.viewer_count = max(0, agg.viewer_count + dv)
+                agg.streamer_count = max(0, agg.streamer_count + ds)
+                self.deltas_applied += 1
+            self._ranked = None
+        # The stored counter moved with the deltas; this copy of the totals only moves now
+        versions.touch("categories")
+
+    def name(self, category_id: Optional[str]) -> Optional[str]:
+        agg = self._cats.get(category_id) if category_id is not None else None
+        return agg.name if agg is not None else None
+
+    def ranked(self) -> List[CategoryAggregate]:
+        """All categories, most viewers first."""
+        with self._lock:
+            if self._ranked is None:
+                self._ranked = sorted(
+                    self._cats.values(),
+                    key=lambda c: (-c.viewer_count, -c.streamer_count, c.name),
+                )
+            return self._ranked
+
+    def stats(self) -> dict:
+        return {
+            "categories": len(self._cats),
+            "reconciles": self.reconciles,
+            "deltas_applied": self.deltas_applied,
+            "drift_corrections": self.drift_corrections,
+            "age_seconds": round(time.monotonic() - self._reconciled_at, 3) if self._reconciled_at is not None else None,
+        }
+
+
+category_stats = CategoryStats(reconcile_seconds=settings.CATEGORY_STATS_RECONCILE_SECONDS)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import ReadSessionLocal
+from app.models.channel import Channel
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelSampler:
+    """
+    Dense in-memory array of every channel_id, so `limit` random channels cost O(limit)
+    instead of loading and shuffling the whole channels table.
+
+    New channels are appended as they are created; ids that no longer resolve are dropped
+    when a sample misses them. A full reload (ids only) runs at most every `refresh_seconds`
+    to pick up channels created by other workers. Only the first load runs on a request;
+    later ones run in a background thread, one at a time, while requests keep sampling the
+    previous ids.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._ids: List[str] = []
+        self._pos: Dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        # Ids added while a reload runs, which its snapshot may predate
+        self._added: Set[str] = set()
+
+        self.reloads = 0
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_seconds
+
+    def ensure_fresh(self, db: Session) -> None:
+        if self._is_fresh():
+            return
+        if self._loaded_at is None:
+            with self._reload_lock:
+                if self._loaded_at is None:
+                    self._load(db)
+            return
+        if self._reload_lock.acquire(blocking=False):
+            threading.Thread(target=self._reload, name="channel-sampler-reload", daemon=True).start()
+
+    def _reload(self) -> None:
+        try:
+            # The previous holder of the lock may have reloaded already
+            if self._is_fresh():
+                return
+            db = ReadSessionLocal()
+            try:
+                self._load(db)
+            finally:
+                db.close()
+        except Exception:
+            logger.exception("channel sampler reload failed")
+        finally:
+            self._reload_lock.release()
+
+    def _load(self, db: Session) -> None:
+        with self._lock:
+            self._added = set()
+        ids = [r[0] for r in db.query(Channel.channel_id).all()]
+        with self._lock:
+            known = set(ids)
+            ids += [cid for cid in self._added if cid not in known]
+            self._ids = ids
+            self._pos = {cid: i for i, cid in enumerate(ids)}
+            self._loaded_at = time.monotonic()
+            self.reloads += 1
+
+    def add(self, channel_id: str) -> None:
+        with self._lock:
+            self._added.add(channel_id)
+            if channel_id not in self._pos:
+                self._pos[channel_id] = len(self._ids)
+                self._ids.append(channel_id)
+
+    def remove(self, channel_id: str) -> None:
+        # Swap with the last id so the array stays dense
+        with self._lock:
+            i = self._pos.pop(channel_id, None)
+            if i is None:
+                return
+            last = self._ids.pop()
+            if i < len(self._ids):
+                self._ids[i] = last
+                self._pos[last] = i
+
+    def sample(self, k: int, exclude: Iterable[str] = ()) -> List[str]:
+        excluded = set(exclude)
+        with self._lock:
+            n = len(self._ids)
+            picks = random.sample(range(n), min(n, k + len(excluded)))
+            ids = [self._ids[i] for i in picks]
+        return [cid for cid in ids if cid not in excluded][:k]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def stats(self) -> dict:
+        return {
+            "channels": len(self._ids),
+            "reloads": self.reloads,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 3) if self._loaded_at is not None else None,
+        }
+
+
+channel_sampler = ChannelSampler(refresh_seconds=settings.CHANNEL_SAMPLER_REFRESH_SECONDS)
@@ -1,8 +1,13 @@
+import random
 import uuid
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.etag import versions
 from app.models.channel import Channel
 from app.models.user import User
+from app.services.channel_sampler import channel_sampler
+from app.services.live_directory import live_directory
 
 def get_or_create_channel(db: Session, actor: User) -> Channel:
     ch = db.query(Channel).filter(Channel.user_id == actor.user_id).first()
@@ -21,8 +26,10 @@ def get_or_create_channel(db: Session, actor: User) -> Channel:
         panels=None,
     )
     db.add(ch)
+    versions.bump(db, "channels")
     db.commit()
     db.refresh(ch)
+    channel_sampler.add(ch.channel_id)
     return ch
 
 def get_channel_by_username(db: Session, username: str) -> Channel:
@@ -34,3 +41,61 @@ def get_channel_by_username(db: Session, username: str) -> Channel:
     if not ch:
         raise HTTPException(status_code=404, detail="Channel not found")
     return ch
+
+# At most this many IN queries per call: the first, then replacements for deleted channels
+_TOP_UP_ROUNDS = 3
+
+def recommended_channels(
+    db: Session,
+    limit: int,
+    exclude_user_id: str | None = None,
+    live_first: bool = False,
+) -> list[tuple[Channel, User]]:
+    """
+    Up to `limit` random channels (with their users) without scanning the channels table:
+    ids are drawn from channel_sampler and resolved with one primary-key IN query.
+    With `live_first`, live channels (from the live directory) fill the list before others.
+    """
+    channel_sampler.ensure_fresh(db)
+
+    # One spare per request for the actor's own channel
+    want = limit + (1 if exclude_user_id else 0)
+    picked: list[str] = []
+    if live_first and settings.LIVE_DIRECTORY_ENABLED:
+        live_directory.ensure_fresh(db)
+        live_ids = live_directory.live_channel_ids()
+        picked = random.sample(live_ids, min(want, len(live_ids)))
+    if len(picked) < want:
+        picked += channel_sampler.sample(want - len(picked), exclude=picked)
+
+    out = []
+    tried = set(picked)
+    # Ids deleted since the sampler last saw them are dropped and replaced by fresh draws
+    for _ in range(_TOP_UP_ROUNDS):
+        rows = (
+            db.query(Channel, User)
+            .join(User, User.user_id == Channel.user_id)
+            .filter(Channel.channel_id.in_(picked))
+            .all()
+        )
+        by_id = {ch.channel_id: (ch, u) for ch, u in rows}
+
+        missing = 0
+        for cid in picked:
+            row = by_id.get(cid)
+            if row is None:
+                channel_sampler.remove(cid)
+                missing += 1
+                continue
+            if exclude_user_id and row[1].user_id == exclude_user_id:
+                continue
+            out.append(row)
+
+        if not missing or len(out) >= limit:
+            break
+        # Oversample: if some ids are stale, the replacements may be too
+        picked = channel_sampler.sample(2 * missing, exclude=tried)
+        if not picked:
+            break
+        tried.update(picked)
+    return out[:limit]
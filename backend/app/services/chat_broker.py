@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Dict, Optional, Set
+
+from app.core.config import settings
+
+
+class Subscription:
+    """One live-chat listener (a WebSocket or SSE connection) with its own bounded queue."""
+
+    def __init__(self, stream_id: str, maxsize: int):
+        self.stream_id = stream_id
+        self.queue: "asyncio.Queue[Optional[dict]]" = asyncio.Queue(maxsize=maxsize)
+        # Why the subscription ended: "slow_consumer", "stream_ended" or None while it is open
+        self.closed_reason: Optional[str] = None
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Next message, or None once the subscription has been closed by the broker."""
+        if timeout is None:
+            return await self.queue.get()
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def _close(self, reason: str) -> None:
+        self.closed_reason = reason
+        # Drop whatever is still buffered so the close marker always fits
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class ChatBroker:
+    """
+    Per-stream in-process pub/sub for live chat.
+
+    `publish` may be called from sync endpoints running in the threadpool; delivery always
+    happens on the event loop that owns the subscriber queues. A subscriber whose queue is
+    full is dropped instead of slowing down everyone else (it can reconnect and backfill
+    through GET /streams/{stream_id}/chat).
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, stream_id: str) -> Subscription:
+        self._loop = asyncio.get_running_loop()
+        sub = Subscription(stream_id, self.queue_size)
+        with self._lock:
+            self._subs.setdefault(stream_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.stream_id)
+            if subs is None:
+                return
+            subs.discard(sub)
+            if not subs:
+                del self._subs[sub.stream_id]
+
+    def publish(self, stream_id: str, message: dict) -> None:
+        self.published += 1
+        loop = self._loop
+        if loop is None or loop.is_closed() or stream_id not in self._subs:
+            return
+        if _running_loop() is loop:
+            self._deliver(stream_id, message)
+        else:
+            loop.call_soon_threadsafe(self._deliver, stream_id, message)
+
+    def close_stream(self, stream_id: str) -> None:
+        """Ends every subscription of a stream (e.g. when the stream stops)."""
+        loop = self._loop
+        if loop is None or loop.is_closed() or stream_id not in self._subs:
+            return
+        if _running_loop() is loop:
+            self._close_all(stream_id)
+        else:
+            loop.call_soon_threadsafe(self._close_all, stream_id)
+
+    def _deliver(self, stream_id: str, message: dict) -> None:
+        with self._lock:
+            subs = list(self._subs.get(stream_id, ()))
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(message)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self.unsubscribe(sub)
+                sub._close("slow_consumer")
+
+    def _close_all(self, stream_id: str) -> None:
+        with self._lock:
+            subs = self._subs.pop(stream_id, set())
+        for sub in subs:
+            sub._close("stream_ended")
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscribers = sum(len(s) for s in self._subs.values())
+            streams = len(self._subs)
+        return {
+            "streams": streams,
+            "subscribers": subscribers,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_subscribers": self.dropped,
+        }
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+chat_broker = ChatBroker(queue_size=settings.CHAT_SUBSCRIBER_QUEUE_SIZE)
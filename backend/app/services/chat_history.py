@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import base64
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+# Keyset position of a message inside its stream: its seq (see ChatMessage.seq)
+ChatKey = int
+
+
+def naive_utc(dt: datetime) -> datetime:
+    """SQLite hands back naive datetimes; normalize aware ones so both compare and sort together."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def encode_cursor(key: ChatKey) -> str:
+    return base64.urlsafe_b64encode(str(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ChatKey:
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class _Ring:
+    def __init__(self, size: int):
+        self.items: Deque[Tuple[ChatKey, dict]] = deque(maxlen=size)
+        self.warm = False
+        # True while the ring still holds every message of the stream (nothing loaded or pushed out)
+        self.complete = False
+        # seq of the newest message, known once warm (0: the stream has no chat yet)
+        self.last: Optional[int] = None
+        # When `last` was last known to match the database (monotonic clock)
+        self.checked_at = 0.0
+
+
+class ChatHistory:
+    """
+    Bounded ring buffer of the most recent chat messages per live stream, with the author's
+    display data already attached, so the "latest messages" path needs no SQL and no join.
+
+    `window` answers a keyset query from memory when the ring provably covers it, and returns
+    None otherwise so the caller can fall back to the database. Messages are appended by the
+    chat writer in seq order; a gap (a message committed by another worker) drops the ring so
+    the next read reloads it. Messages of other workers that no local append follows are caught
+    by `unchecked_last` / `confirm`: at most every `refresh_seconds` a read compares the ring
+    with the stream's newest seq in the database.
+    """
+
+    def __init__(self, size: int, max_streams: int, refresh_seconds: float):
+        self.size = size
+        self.max_streams = max_streams
+        self.refresh_seconds = refresh_seconds
+        self._rings: "OrderedDict[str, _Ring]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and self.max_streams > 0
+
+    def is_warm(self, stream_id: str) -> bool:
+        with self._lock:
+            ring = self._rings.get(stream_id)
+            return ring is not None and ring.warm
+
+    def begin_warm(self, stream_id: str) -> None:
+        """
+        Registers the ring before the database load so messages appended meanwhile are kept
+        and merged by `finish_warm`.
+        """
+        with self._lock:
+            if stream_id not in self._rings:
+                self._rings[stream_id] = _Ring(self.size)
+                while len(self._rings) > self.max_streams:
+                    self._rings.popitem(last=False)
+
+    def finish_warm(self, stream_id: str, loaded: List[Tuple[ChatKey, dict]]) -> None:
+        """`loaded` is the newest `size` messages from the database, oldest first."""
+        with self._lock:
+            ring = self._rings.get(stream_id)
+            if ring is None or ring.warm:
+                return
+            last = loaded[-1][0] if loaded else 0
+            merged = loaded + [(k, v) for k, v in ring.items if k > last]
+            first = merged[0][0] if loaded else 1
+            if any(k != first + i for i, (k, _) in enumerate(merged)):
+                # Something committed between the load and the first append is missing
+                del self._rings[stream_id]
+                return
+            ring.items.clear()
+            ring.items.extend(merged)
+            ring.complete = len(merged) < self.size
+            ring.last = merged[-1][0] if merged else 0
+            ring.checked_at = time.monotonic()
+            ring.warm = True
+
+    def append(self, stream_id: str, seq: ChatKey, item: dict) -> None:
+        with self._lock:
+            ring = self._rings.get(stream_id)
+            if ring is None:
+                # Not cached yet: the next read loads it from the database
+                return
+            if ring.last is not None and seq != ring.last + 1:
+                if seq > ring.last:
+                    # Another worker committed in between: reload rather than serve a gap
+                    del self._rings[stream_id]
+                return
+            self._rings.move_to_end(stream_id)
+            if len(ring.items) == ring.items.maxlen:
+                ring.complete = False
+            ring.items.append((seq, item))
+            if ring.warm:
+                ring.last = seq
+
+    def unchecked_last(self, stream_id: str) -> Optional[ChatKey]:
+        """
+        The ring's newest seq when it is due for a check against the database, else None.
+        Claims the check, so concurrent readers don't all run it.
+        """
+        with self._lock:
+            ring = self._rings.get(stream_id)
+            if ring is None or not ring.warm:
+                return None
+            now = time.monotonic()
+            if now - ring.checked_at < self.refresh_seconds:
+                return None
+            ring.checked_at = now
+            return ring.last
+
+    def confirm(self, stream_id: str, newest: ChatKey) -> None:
+        """`newest` is the stream's max(seq) in the database; a ring behind it is dropped."""
+        with self._lock:
+            ring = self._rings.get(stream_id)
+            if ring is not None and ring.warm and newest > ring.last:
+                del self._rings[stream_id]
+                self.refreshes += 1
+
+    def drop(self, stream_id: str) -> None:
+        with self._lock:
+            self._rings.pop(stream_id, None)
+
+    def window(
+        self,
+        stream_id: str,
+        limit: int,
+        after: Optional[ChatKey] = None,
+        before: Optional[ChatKey] = None,
+    ) -> Optional[List[Tuple[ChatKey, dict]]]:
+        """
+        Messages in ascending order: the first `limit` after `after`, the last `limit` before
+        `before`, or the latest `limit` when neither is given.
+        """
+        with self._lock:
+            ring = self._rings.get(stream_id)
+            if ring is None or not ring.warm:
+                self.misses += 1
+                return None
+            self._rings.move_to_end(stream_id)
+            items = list(ring.items)
+            complete = ring.complete
+
+        out: Optional[List[Tuple[ChatKey, dict]]] = None
+        if after is not None:
+            if complete or (items and items[0][0] <= after):
+                out = [kv for kv in items if kv[0] > after][:limit]
+        else:
+            if before is not None:
+                items = [kv for kv in items if kv[0] < before]
+            if complete or len(items) >= limit:
+                out = items[-limit:]
+
+        if out is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            streams = len(self._rings)
+            messages = sum(len(r.items) for r in self._rings.values())
+        lookups = self.hits + self.misses
+        return {
+            "streams": streams,
+            "messages": messages,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+chat_history = ChatHistory(
+    size=settings.CHAT_RING_SIZE,
+    max_streams=settings.CHAT_RING_MAX_STREAMS,
+    refresh_seconds=settings.CHAT_RING_REFRESH_SECONDS,
+)
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.chat_message import ChatMessage
+from app.models.stream import Stream
+from app.services.chat_broker import chat_broker
+from app.services.chat_history import chat_history
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class DuplicateMessageId(Exception):
+    """The message_id is already taken by a message of another user or stream."""
+
+
+_chat = ChatMessage.__table__
+_COLUMNS = ["message_id", "stream_id", "user_id", "content", "created_at"]
+
+# seq is max + 1 of the stream, computed by the INSERT itself: SQLite runs one write
+# transaction at a time, so seq follows commit order even across worker processes. Other
+# databases run writers concurrently; there _LOCK_STREAMS goes first (see _flush).
+_INSERT = insert(_chat).from_select(
+    _COLUMNS + ["seq"],
+    select(
+        *(bindparam(c, type_=_chat.c[c].type) for c in _COLUMNS),
+        select(func.coalesce(func.max(_chat.c.seq), 0) + 1)
+        .where(_chat.c.stream_id == bindparam("stream_id"))
+        .scalar_subquery(),
+    ),
+)
+
+# Row locks on the streams of a batch, in a fixed order so two writers can't deadlock
+_LOCK_STREAMS = (
+    select(Stream.stream_id)
+    .where(Stream.stream_id.in_(bindparam("stream_ids", expanding=True)))
+    .order_by(Stream.stream_id)
+    .with_for_update()
+)
+
+
+class ChatWriter:
+    """
+    Write-behind queue for chat inserts (group commit).
+
+    Messages submitted within `window_ms` of each other, up to `max_batch`, are inserted by a
+    single background thread in one transaction, so a busy channel costs one commit per batch
+    instead of one per line. `submit` returns a Future that resolves once the batch is committed.
+
+    The same thread then hands the committed messages, with their seq, to `publish` in seq
+    order, so the ring buffer and live subscribers never see a later message before an earlier one.
+
+    Inserts are idempotent on message_id: a row whose id is already stored (a client retrying
+    after a timeout) is not inserted or published again, and resolves to the stored seq.
+    """
+
+    def __init__(
+        self,
+        window_ms: float,
+        max_batch: int,
+        session_factory: Callable[[], Session] = SessionLocal,
+        publish: Optional[Callable[[dict], None]] = None,
+    ):
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.session_factory = session_factory
+        self.publish = publish
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self.batches = 0
+        self.messages = 0
+        self.failed_batches = 0
+        self.duplicates = 0
+        self.max_batch_size = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="chat-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flushes whatever is queued and stops the writer thread."""
+        with self._start_lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def submit(self, row: dict, message: dict) -> Future:
+        """
+        Queues one chat_messages row (a dict of column values, without seq) and the message
+        published once it is committed; the Future resolves to that message.
+        """
+        if self._thread is None:
+            self.start()
+        fut: Future = Future()
+        self._queue.put((row, message, fut))
+        return fut
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            batch: List[Tuple[dict, dict, Future]] = [item]
+            deadline = time.monotonic() + self.window
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch: List[Tuple[dict, dict, Future]]) -> None:
+        started = time.perf_counter()
+        ids = [row["message_id"] for row, _, _ in batch]
+        db = self.session_factory()
+        try:
+            owners = {
+                m: (stream_id, user_id)
+                for m, stream_id, user_id in db.execute(
+                    select(_chat.c.message_id, _chat.c.stream_id, _chat.c.user_id).where(_chat.c.message_id.in_(ids))
+                )
+            }
+            # First submission of every id not stored yet (a retry can share the batch with the original)
+            new = []
+            for row, _, _ in batch:
+                if row["message_id"] not in owners:
+                    owners[row["message_id"]] = (row["stream_id"], row["user_id"])
+                    new.append(row)
+            if new:
+                if db.get_bind().dialect.name != "sqlite":
+                    # Writers of other processes wait here until this batch commits, and the INSERT
+                    # (a new snapshot under READ COMMITTED) then sees their messages in max(seq)
+                    db.execute(_LOCK_STREAMS, {"stream_ids": sorted({row["stream_id"] for row in new})})
+                db.execute(_INSERT, new)
+            seqs = dict(db.execute(select(_chat.c.message_id, _chat.c.seq).where(_chat.c.message_id.in_(ids))).all())
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.failed_batches += 1
+            logger.exception("chat batch of %d messages failed", len(batch))
+            for _, _, fut in batch:
+                fut.set_exception(e)
+            return
+        finally:
+            db.close()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        self.batches += 1
+        self.messages += len(batch)
+        self.max_batch_size = max(self.max_batch_size, len(batch))
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+        # Rows were inserted in batch order, so this is seq order within every stream
+        inserted = {id(row) for row in new}
+        for row, message, fut in batch:
+            if owners[row["message_id"]] != (row["stream_id"], row["user_id"]):
+                fut.set_exception(DuplicateMessageId(row["message_id"]))
+                continue
+            message["seq"] = seqs[row["message_id"]]
+            if id(row) not in inserted:
+                self.duplicates += 1
+            elif self.publish is not None:
+                try:
+                    self.publish(message)
+                except Exception:
+                    logger.exception("publishing chat message %s failed", row["message_id"])
+            fut.set_result(message)
+
+    def stats(self) -> dict:
+        return {
+            "mode": settings.CHAT_WRITE_MODE,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "messages": self.messages,
+            "failed_batches": self.failed_batches,
+            "duplicates": self.duplicates,
+            "avg_batch_size": round(self.messages / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.batches, 3) if self.batches else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
+
+
+def _publish(message: dict) -> None:
+    chat_history.append(message["stream_id"], message["seq"], message)
+    chat_broker.publish(message["stream_id"], message)
+
+
+chat_writer = ChatWriter(
+    window_ms=settings.CHAT_BATCH_WINDOW_MS,
+    max_batch=settings.CHAT_BATCH_MAX,
+    publish=_publish,
+)
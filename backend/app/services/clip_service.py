@@ -1,9 +1,81 @@
+import base64
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
+
+from app.models.category import Category
+from app.models.channel import Channel
 from app.models.clip import Clip
+from app.models.stream import Stream
 from app.models.user import User
 
-def list_clips(db: Session, limit: int = 24):
-    return db.query(Clip).order_by(Clip.view_count.desc()).limit(limit).all()
+# (view_count, clip_id) of the last clip on a page
+ClipKey = Tuple[int, str]
+
+
+def encode_cursor(key: ClipKey) -> str:
+    raw = f"{key[0]}|{key[1]}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ClipKey:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        view_count, clip_id = raw.split("|", 1)
+        return int(view_count), clip_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _clip_rows(db: Session):
+    """Clip columns plus its channel's and category's, under the names CLIP_CARD reads."""
+    return (
+        db.query(
+            Clip.clip_id,
+            Clip.title,
+            Clip.thumbnail_url,
+            Clip.duration_seconds,
+            Clip.view_count,
+            Clip.stream_id,
+            Channel.channel_id,
+            User.username.label("channel_username"),
+            func.coalesce(func.nullif(User.display_name, ""), User.username).label("channel_display_name"),
+            User.avatar_url.label("channel_avatar_url"),
+            Stream.category_id,
+            Category.name.label("category_name"),
+        )
+        .select_from(Clip)
+        .outerjoin(Stream, Stream.stream_id == Clip.stream_id)
+        .outerjoin(Channel, Channel.channel_id == Stream.channel_id)
+        .outerjoin(User, User.user_id == Channel.user_id)
+        .outerjoin(Category, Category.category_id == Stream.category_id)
+    )
+
+
+def _page(db: Session, q, limit: int, after: Optional[ClipKey]) -> Tuple[List[Any], Optional[str]]:
+    """
+    One page of clip rows (see _clip_rows), most viewed first, from a single joined query.
+    Returns the rows and the cursor of the next page (None on the last one).
+    """
+    if after is not None:
+        q = q.filter(or_(
+            Clip.view_count < after[0],
+            and_(Clip.view_count == after[0], Clip.clip_id < after[1]),
+        ))
+    # One extra row tells whether there is a next page
+    rows = q.order_by(Clip.view_count.desc(), Clip.clip_id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor((last.view_count, last.clip_id))
+
+
+def list_clips(db: Session, limit: int = 24, after: Optional[ClipKey] = None):
+    return _page(db, _clip_rows(db), limit, after)
+
 
-def list_user_clips(db: Session, user: User, limit: int = 24):
-    return db.query(Clip).filter(Clip.creator_id == user.user_id).order_by(Clip.view_count.desc()).limit(limit).all()
+def list_user_clips(db: Session, user: User, limit: int = 24, after: Optional[ClipKey] = None):
+    return _page(db, _clip_rows(db).filter(Clip.creator_id == user.user_id), limit, after)
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.etag import versions
+from app.db.session import SessionLocal
+from app.models.clip import Clip
+
+logger = logging.getLogger(__name__)
+
+
+class _Shard:
+    __slots__ = ("lock", "counts")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+
+class ClipViewCounter:
+    """
+    Write-behind counter for clip views.
+
+    `record` adds one to an in-memory counter (sharded by clip, so concurrent callers rarely
+    contend on one lock); a background thread moves the accumulated deltas into
+    Clip.view_count every `flush_seconds` with one executemany UPDATE, so a viral clip costs one
+    row update per flush rather than per view. Views not yet committed are returned by `pending`
+    and added by /home (the ETag'd /clips shows stored counts only), and a crash loses at most one
+    flush window.
+    """
+
+    def __init__(
+        self,
+        flush_seconds: float,
+        shards: int,
+        max_pending: int,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.session_factory = session_factory
+        self._shards: List[_Shard] = [_Shard() for _ in range(max(1, shards))]
+        # Deltas taken out of the shards by a flush that hasn't committed yet
+        self._inflight: Dict[str, int] = {}
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.views = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.flushed_rows = 0
+        self.last_flush_ms = 0.0
+
+    def _shard(self, clip_id: str) -> _Shard:
+        return self._shards[hash(clip_id) % len(self._shards)]
+
+    def pending_clips(self) -> int:
+        return sum(len(s.counts) for s in self._shards)
+
+    def record(self, clip_id: str, n: int = 1) -> bool:
+        """Counts `n` views; False when too many distinct clips are waiting for the next flush."""
+        shard = self._shard(clip_id)
+        with shard.lock:
+            if clip_id not in shard.counts and self.pending_clips() >= self.max_pending:
+                self.rejected += 1
+                return False
+            shard.counts[clip_id] = shard.counts.get(clip_id, 0) + n
+            self.views += n
+        return True
+
+    def pending(self, clip_id: str) -> int:
+        """Views of a clip that readers should add to its stored view_count."""
+        return self._inflight.get(clip_id, 0) + self._shard(clip_id).counts.get(clip_id, 0)
+
+    def _add(self, clip_id: str, n: int) -> None:
+        shard = self._shard(clip_id)
+        with shard.lock:
+            shard.counts[clip_id] = shard.counts.get(clip_id, 0) + n
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            started = time.perf_counter()
+            # Shard counts move into the published in-flight dict, so readers keep seeing them
+            deltas: Dict[str, int] = {}
+            self._inflight = deltas
+            for shard in self._shards:
+                with shard.lock:
+                    for clip_id, n in shard.counts.items():
+                        deltas[clip_id] = deltas.get(clip_id, 0) + n
+                    shard.counts = {}
+            if not deltas:
+                return 0
+
+            t = Clip.__table__
+            stmt = (
+                update(t)
+                .where(t.c.clip_id == bindparam("cid"))
+                .values(view_count=func.coalesce(t.c.view_count, 0) + bindparam("n"))
+            )
+            db = self.session_factory()
+            try:
+                db.execute(stmt, [{"cid": cid, "n": n} for cid, n in deltas.items()])
+                versions.bump(db, "clips")
+                db.commit()
+            except Exception:
+                db.rollback()
+                self.failed_flushes += 1
+                # Keep the views for the next attempt
+                for cid, n in deltas.items():
+                    self._add(cid, n)
+                self._inflight = {}
+                raise
+            finally:
+                db.close()
+
+            self._inflight = {}
+            self.flushes += 1
+            self.flushed_rows += len(deltas)
+            self.last_flush_ms = (time.perf_counter() - started) * 1000.0
+            return len(deltas)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="clip-views", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stops the flusher and writes whatever is still pending."""
+        thread = self._thread
+        self._thread = None
+        if thread is not None and thread.is_alive():
+            self._stop.set()
+            thread.join(timeout)
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("final clip view flush failed")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("clip view flush failed")
+
+    def stats(self) -> dict:
+        return {
+            "views": self.views,
+            "pending_clips": self.pending_clips(),
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+
+clip_views = ClipViewCounter(
+    flush_seconds=settings.CLIP_VIEW_FLUSH_SECONDS,
+    shards=settings.CLIP_VIEW_SHARDS,
+    max_pending=settings.CLIP_VIEW_MAX_PENDING,
+)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.channel import Channel
+from app.models.follow import Follow
+from app.models.user import User
+from app.services.live_directory import LiveCard, live_directory, query_live_cards
+
+
+@dataclass(frozen=True)
+class FollowedEntry:
+    user_id: str
+    username: str
+    display_name: str
+    avatar_url: Optional[str]
+    channel_id: Optional[str]
+    followed_at: Optional[str]
+
+
+@dataclass(frozen=True)
+class FollowSet:
+    """Everything a user follows, oldest follow first, plus the followed channel ids as a set."""
+    entries: Tuple[FollowedEntry, ...]
+    channel_ids: FrozenSet[str]
+
+
+# follower user_id -> FollowSet; dropped by follow/unfollow in this worker, TTL bounds the rest
+follow_sets = TTLCache(maxsize=settings.FOLLOW_SET_CACHE_SIZE, ttl=settings.FOLLOW_SET_CACHE_TTL)
+
+
+def _load(db: Session, user_id: str) -> FollowSet:
+    rows = db.execute(
+        select(
+            Follow.followed_user_id, User.username, User.display_name, User.avatar_url,
+            Channel.channel_id, Follow.created_at,
+        )
+        .join(User, User.user_id == Follow.followed_user_id)
+        .outerjoin(Channel, Channel.user_id == Follow.followed_user_id)
+        .where(Follow.follower_id == user_id)
+        .order_by(Follow.created_at.asc())
+    ).all()
+    entries = tuple(
+        FollowedEntry(
+            user_id=uid,
+            username=username,
+            display_name=display_name or username,
+            avatar_url=avatar_url,
+            channel_id=channel_id,
+            followed_at=str(created_at) if created_at else None,
+        )
+        for uid, username, display_name, avatar_url, channel_id, created_at in rows
+    )
+    return FollowSet(entries, frozenset(e.channel_id for e in entries if e.channel_id))
+
+
+def follow_set(db: Session, user_id: str) -> FollowSet:
+    cached = follow_sets.get(user_id)
+    if cached is not None:
+        return cached
+    loaded = _load(db, user_id)
+    follow_sets.set(user_id, loaded)
+    return loaded
+
+
+def invalidate(user_id: str) -> None:
+    """Call after the user follows or unfollows someone."""
+    follow_sets.pop(user_id)
+
+
+def live_feed(db: Session, user_id: str) -> List[Tuple[FollowedEntry, Optional[LiveCard]]]:
+    """
+    The user's follows with the live ones first (most viewers first), each paired with its live
+    card; the rest follow in follow order. Live status is one set intersection against the live
+    directory's channel ids.
+    """
+    fs = follow_set(db, user_id)
+    if not fs.entries:
+        return []
+
+    if settings.LIVE_DIRECTORY_ENABLED:
+        live_directory.ensure_fresh(db)
+        cards = live_directory.for_channels(fs.channel_ids)
+    else:
+        cards = [c for c in query_live_cards(db) if c.channel_id in fs.channel_ids]
+
+    by_channel: Dict[str, LiveCard] = {c.channel_id: c for c in cards}
+    live = sorted(
+        ((e, by_channel[e.channel_id]) for e in fs.entries if e.channel_id in by_channel),
+        key=lambda pair: pair[1].viewer_count,
+        reverse=True,
+    )
+    offline = [(e, None) for e in fs.entries if e.channel_id not in by_channel]
+    return live + offline
+
+
+def stats() -> dict:
+    return follow_sets.stats()
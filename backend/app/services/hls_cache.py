@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.config import settings
+from app.services.hls_playlist import Playlist, parse_playlist
+
+# Media segments never change once nginx-rtmp has written them, so they are safe to share between viewers.
+SEGMENT_SUFFIXES = (".ts", ".m4s", ".aac")
+
+
+def is_segment(path: str) -> bool:
+    return (path or "").lower().endswith(SEGMENT_SUFFIXES)
+
+
+def is_playlist(path: str) -> bool:
+    return (path or "").lower().endswith(".m3u8")
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    media_type: str
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+Fetch = Callable[[], Awaitable[CachedResponse]]
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one running task.
+    The task runs on its own so a disconnecting client doesn't cancel it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def pending(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: self._done(key, t))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark as retrieved so a fetch whose waiters all went away doesn't log "never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+
+class SegmentCache:
+    """
+    Byte-budgeted LRU of upstream responses keyed by (url, range).
+
+    Concurrent misses for the same key share a single upstream fetch: the first caller
+    runs `fetch`, everyone else awaits its result.
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._flight = SingleFlight()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries or self._flight.pending(key)
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, entry: CachedResponse) -> None:
+        size = len(entry.body)
+        if entry.status_code not in (200, 206) or size > self.max_item_bytes or size > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old.body)
+
+        self._entries[key] = entry
+        self._bytes += size
+
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.body)
+            self.evictions += 1
+
+    async def get_or_fetch(self, key: Hashable, fetch: Fetch) -> CachedResponse:
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        if self._flight.pending(key):
+            self.coalesced += 1
+        else:
+            self.misses += 1
+
+        async def fill() -> CachedResponse:
+            fetched = await fetch()
+            self.put(key, fetched)
+            return fetched
+
+        return await self._flight.do(key, fill)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+class PlaylistCache:
+    """
+    Micro-cache for live playlists.
+
+    Each entry lives for a fraction of the playlist's own #EXT-X-TARGETDURATION (nginx only rewrites
+    the playlist once per fragment), so any number of polling players cost about one upstream fetch
+    per playlist per interval. `on_new_version` is called whenever the media sequence moves.
+    """
+
+    def __init__(
+        self,
+        ttl_fraction: float,
+        default_ttl: float,
+        min_ttl: float,
+        max_ttl: float,
+        max_entries: int,
+        on_new_version: Optional[Callable[[Hashable, Playlist], None]] = None,
+    ):
+        self.ttl_fraction = ttl_fraction
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.max_entries = max_entries
+        self.on_new_version = on_new_version
+
+        # key -> (expires_at, response, media_sequence)
+        self._entries: "OrderedDict[Hashable, Tuple[float, CachedResponse, Optional[int]]]" = OrderedDict()
+        self._flight = SingleFlight()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.new_versions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_ttl > 0
+
+    def ttl_for(self, playlist: Playlist) -> float:
+        if playlist.target_duration is None:
+            return self.default_ttl
+        return max(self.min_ttl, min(self.max_ttl, playlist.target_duration * self.ttl_fraction))
+
+    def get(self, key: Hashable) -> Optional[Tuple[CachedResponse, float]]:
+        """Returns (response, seconds left) for a fresh entry."""
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, entry, _ = item
+        left = expires_at - time.monotonic()
+        if left <= 0:
+            return None
+        return entry, left
+
+    async def get_or_fetch(self, key: Hashable, fetch: Fetch) -> Tuple[CachedResponse, float]:
+        hit = self.get(key)
+        if hit is not None:
+            self.hits += 1
+            return hit
+
+        if self._flight.pending(key):
+            self.coalesced += 1
+        else:
+            self.misses += 1
+
+        return await self._flight.do(key, lambda: self._fill(key, fetch))
+
+    async def _fill(self, key: Hashable, fetch: Fetch) -> Tuple[CachedResponse, float]:
+        entry = await fetch()
+        if entry.status_code != 200:
+            return entry, 0.0
+
+        playlist = parse_playlist(entry.body.decode("utf-8", errors="replace"))
+        ttl = self.ttl_for(playlist)
+
+        previous = self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + ttl, entry, playlist.media_sequence)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        if previous is None or previous[2] != playlist.media_sequence:
+            self.new_versions += 1
+            if self.on_new_version is not None:
+                self.on_new_version(key, playlist)
+
+        return entry, ttl
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "new_versions": self.new_versions,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+segment_cache = SegmentCache(
+    max_bytes=settings.HLS_SEGMENT_CACHE_BYTES,
+    max_item_bytes=settings.HLS_SEGMENT_CACHE_MAX_ITEM_BYTES,
+)
+
+playlist_cache = PlaylistCache(
+    ttl_fraction=settings.HLS_PLAYLIST_TTL_FRACTION,
+    default_ttl=settings.HLS_PLAYLIST_DEFAULT_TTL,
+    min_ttl=settings.HLS_PLAYLIST_MIN_TTL,
+    max_ttl=settings.HLS_PLAYLIST_MAX_TTL,
+    max_entries=settings.HLS_PLAYLIST_CACHE_ENTRIES,
+)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class Playlist:
+    target_duration: Optional[float] = None
+    media_sequence: Optional[int] = None
+    segments: List[str] = field(default_factory=list)
+    variants: List[str] = field(default_factory=list)
+
+    @property
+    def is_master(self) -> bool:
+        return bool(self.variants)
+
+
+def parse_playlist(text: str) -> Playlist:
+    """
+    Minimal M3U8 parser: only reads what the proxy needs to size its cache TTL and warm segments.
+    Media playlists fill `segments`, master playlists fill `variants` (both as URIs in file order).
+    """
+    pl = Playlist()
+    expect_uri: Optional[list] = None
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+
+        if line.startswith("#"):
+            tag, _, value = line.partition(":")
+            if tag == "#EXT-X-TARGETDURATION":
+                try:
+                    pl.target_duration = float(value)
+                except ValueError:
+                    pass
+            elif tag == "#EXT-X-MEDIA-SEQUENCE":
+                try:
+                    pl.media_sequence = int(value)
+                except ValueError:
+                    pass
+            elif tag == "#EXTINF":
+                expect_uri = pl.segments
+            elif tag == "#EXT-X-STREAM-INF":
+                expect_uri = pl.variants
+            continue
+
+        if expect_uri is not None:
+            expect_uri.append(line)
+            expect_uri = None
+
+    return pl
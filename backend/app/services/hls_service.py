@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Optional, Set
+from urllib.parse import urljoin
+
+import httpx
+
+from app.core.config import settings
+from app.services.hls_cache import CachedResponse, is_segment, playlist_cache, segment_cache
+from app.services.hls_playlist import Playlist
+
+_client: Optional[httpx.AsyncClient] = None
+
+# Strong refs to fire-and-forget prefetch tasks so they aren't garbage collected mid-flight
+_prefetch_tasks: Set[asyncio.Task] = set()
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Returns the app-wide upstream client for the HLS server.
+    Connections are kept alive and reused across requests instead of doing a TCP handshake per segment.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.HLS_UPSTREAM_TIMEOUT, read=settings.HLS_UPSTREAM_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.HLS_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HLS_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HLS_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    for task in list(_prefetch_tasks):
+        task.cancel()
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def upstream_url(path: str, query: str = "") -> str:
+    upstream_base = settings.HLS_BASE_URL.rstrip("/")
+    url = f"{upstream_base}/{path.lstrip('/')}"
+    if query:
+        url = f"{url}?{query}"
+    return url
+
+
+def guess_content_type(path: str) -> str:
+    p = (path or "").lower()
+    if p.endswith(".m3u8"):
+        return "application/vnd.apple.mpegurl"
+    if p.endswith(".ts"):
+        return "video/mp2t"
+    return "application/octet-stream"
+
+
+def response_headers(r: httpx.Response) -> dict:
+    # Preserve some headers useful for streaming
+    resp_headers = {}
+    for k in ("accept-ranges", "content-range", "cache-control"):
+        if k in r.headers:
+            resp_headers[k] = r.headers[k]
+
+    # Bodies are relayed decoded, so the upstream length only holds when nothing was compressed
+    if "content-length" in r.headers and "content-encoding" not in r.headers:
+        resp_headers["content-length"] = r.headers["content-length"]
+
+    # Ensure no caching for live content
+    resp_headers.setdefault("cache-control", "no-cache")
+
+    # CORS (even though same-origin usually, it doesn't hurt and helps if API is on a different port)
+    resp_headers["access-control-allow-origin"] = "*"
+    return resp_headers
+
+
+async def fetch_buffered(url: str, path: str, headers: Optional[dict] = None) -> CachedResponse:
+    """Fetches a whole upstream body, in the shape the caches store."""
+    r = await get_client().get(url, headers=headers or {})
+    if r.status_code >= 400:
+        return CachedResponse(status_code=r.status_code, media_type="text/plain", body=r.content)
+
+    resp_headers = response_headers(r)
+    resp_headers.pop("content-length", None)
+    return CachedResponse(
+        status_code=r.status_code,
+        media_type=r.headers.get("content-type") or guess_content_type(path),
+        body=r.content,
+        headers=resp_headers,
+    )
+
+
+async def _warm_segment(url: str) -> None:
+    try:
+        await segment_cache.get_or_fetch((url, None), lambda: fetch_buffered(url, url))
+    except Exception:
+        # Best effort: the player's own request will surface any upstream error
+        pass
+
+
+def prefetch_newest_segments(playlist_url: str, playlist: Playlist) -> None:
+    """
+    Warms the segment cache with the newest segment(s) of a playlist that just changed, so the
+    burst of players that read the new playlist find the segment already cached.
+    """
+    if not segment_cache.enabled or settings.HLS_PREFETCH_SEGMENTS <= 0 or not playlist.segments:
+        return
+
+    base = settings.HLS_BASE_URL.rstrip("/") + "/"
+    for uri in playlist.segments[-settings.HLS_PREFETCH_SEGMENTS:]:
+        url = urljoin(playlist_url, uri)
+        # Only warm what the proxy itself would serve, and skip what is already cached or in flight
+        if not url.startswith(base) or not is_segment(url.split("?", 1)[0]) or (url, None) in segment_cache:
+            continue
+        task = asyncio.ensure_future(_warm_segment(url))
+        _prefetch_tasks.add(task)
+        task.add_done_callback(_prefetch_tasks.discard)
+
+
+playlist_cache.on_new_version = prefetch_newest_segments
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.category import Category
+from app.models.channel import Channel
+from app.models.stream import Stream
+from app.models.user import User
+
+
+@dataclass
+class LiveCard:
+    """Everything the directory endpoints show about one live stream, already joined."""
+    stream_id: str
+    title: str
+    thumbnail_url: Optional[str]
+    started_at: Optional[str]
+    channel_id: str
+    user_id: str
+    channel_username: str
+    channel_display_name: str
+    channel_avatar_url: Optional[str]
+    viewer_count: int
+    category_id: Optional[str]
+    category_name: Optional[str]
+
+
+def live_select(limit: Optional[int] = None, exclude_user_id: Optional[str] = None):
+    """(Stream, Channel, User, Category) rows of every live stream, most viewers first."""
+    stmt = (
+        select(Stream, Channel, User, Category)
+        .join(Channel, Channel.channel_id == Stream.channel_id)
+        .join(User, User.user_id == Channel.user_id)
+        .join(Category, Category.category_id == Stream.category_id, isouter=True)
+        .where(Channel.is_live == True, Stream.ended_at.is_(None))
+    )
+    if exclude_user_id is not None:
+        stmt = stmt.where(User.user_id != exclude_user_id)
+    stmt = stmt.order_by(Channel.current_viewer_count.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def card_from_row(s: Stream, ch: Channel, u: User, cat: Optional[Category]) -> LiveCard:
+    return LiveCard(
+        stream_id=s.stream_id,
+        title=s.title,
+        thumbnail_url=s.thumbnail_url,
+        started_at=str(s.started_at) if s.started_at else None,
+        channel_id=ch.channel_id,
+        user_id=u.user_id,
+        channel_username=u.username,
+        channel_display_name=u.display_name or u.username,
+        channel_avatar_url=u.avatar_url,
+        viewer_count=ch.current_viewer_count or 0,
+        category_id=s.category_id,
+        category_name=cat.name if cat else None,
+    )
+
+
+def query_live_cards(db: Session, limit: Optional[int] = None, exclude_user_id: Optional[str] = None) -> List[LiveCard]:
+    """The same cards straight from the database, for when the directory is disabled."""
+    return [card_from_row(*row) for row in db.execute(live_select(limit, exclude_user_id)).all()]
+
+
+async def query_live_cards_async(db: AsyncSession, limit: Optional[int] = None, exclude_user_id: Optional[str] = None) -> List[LiveCard]:
+    return [card_from_row(*row) for row in (await db.execute(live_select(limit, exclude_user_id))).all()]
+
+
+class LiveDirectory:
+    """
+    In-memory read model of the live streams, kept sorted by viewer count and grouped by category.
+
+    Writes in this process (stream start/stop, viewer counts) update it directly. Because other
+    workers have their own copy, it is also reloaded from the database (one query) at most every
+    `refresh_seconds`, which bounds how stale it can be.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._cards: Dict[str, LiveCard] = {}
+        self._by_channel: Dict[str, str] = {}
+        self._ranked: Optional[List[LiveCard]] = None
+        self._by_category: Optional[Dict[Optional[str], List[LiveCard]]] = None
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+
+        self.reloads = 0
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_seconds
+
+    def ensure_fresh(self, db: Session) -> None:
+        loaded_at = self._loaded_at
+        if self._is_fresh():
+            return
+        # One reload at a time; other requests keep reading the previous snapshot meanwhile
+        if not self._reload_lock.acquire(blocking=loaded_at is None):
+            return
+        try:
+            if self._loaded_at != loaded_at:
+                return
+            self.load(db)
+        finally:
+            self._reload_lock.release()
+
+    async def ensure_fresh_async(self, db: AsyncSession) -> None:
+        if self._is_fresh():
+            return
+        # Never wait on the event loop: skip if a reload is already running and there is a snapshot
+        if not self._reload_lock.acquire(blocking=False):
+            if self._loaded_at is not None:
+                return
+            await self.load_async(db)
+            return
+        try:
+            await self.load_async(db)
+        finally:
+            self._reload_lock.release()
+
+    def load(self, db: Session) -> None:
+        self._install([card_from_row(*row) for row in db.execute(live_select()).all()])
+
+    async def load_async(self, db: AsyncSession) -> None:
+        self._install([card_from_row(*row) for row in (await db.execute(live_select())).all()])
+
+    def _install(self, cards: List[LiveCard]) -> None:
+        with self._lock:
+            self._cards = {c.stream_id: c for c in cards}
+            self._by_channel = {c.channel_id: c.stream_id for c in cards}
+            self._invalidate()
+            self._loaded_at = time.monotonic()
+            self.reloads += 1
+
+    def add_stream(self, db: Session, stream_id: str) -> None:
+        row = db.execute(live_select().where(Stream.stream_id == stream_id)).first()
+        if row is None:
+            return
+        self.upsert(card_from_row(*row))
+
+    def upsert(self, card: LiveCard) -> None:
+        with self._lock:
+            previous = self._by_channel.get(card.channel_id)
+            if previous is not None and previous != card.stream_id:
+                self._cards.pop(previous, None)
+            self._cards[card.stream_id] = card
+            self._by_channel[card.channel_id] = card.stream_id
+            self._invalidate()
+
+    def remove(self, stream_id: str) -> Optional[LiveCard]:
+        with self._lock:
+            card = self._cards.pop(stream_id, None)
+            if card is not None:
+                self._by_channel.pop(card.channel_id, None)
+                self._invalidate()
+            return card
+
+    def set_viewers(self, channel_id: str, count: int) -> None:
+        with self._lock:
+            stream_id = self._by_channel.get(channel_id)
+            card = self._cards.get(stream_id) if stream_id else None
+            if card is None or card.viewer_count == count:
+                return
+            card.viewer_count = count
+            # Grouping is unchanged, only the order
+            self._ranked = None
+            self._by_category = None
+
+    def get(self, stream_id: str) -> Optional[LiveCard]:
+        return self._cards.get(stream_id)
+
+    def ranked(self) -> List[LiveCard]:
+        """All live streams, most viewers first."""
+        with self._lock:
+            if self._ranked is None:
+                self._ranked = sorted(self._cards.values(), key=lambda c: c.viewer_count, reverse=True)
+            return self._ranked
+
+    def top(self, limit: Optional[int] = None, exclude_user_id: Optional[str] = None) -> List[LiveCard]:
+        ranked = self.ranked()
+        if exclude_user_id is None:
+            return ranked if limit is None else ranked[:limit]
+        out = []
+        for c in ranked:
+            if c.user_id == exclude_user_id:
+                continue
+            out.append(c)
+            if limit is not None and len(out) >= limit:
+                break
+        return out
+
+    def in_category(self, category_id: Optional[str]) -> List[LiveCard]:
+        """Live streams of one category, most viewers first."""
+        with self._lock:
+            if self._by_category is None:
+                groups: Dict[Optional[str], List[LiveCard]] = {}
+                for c in self.ranked():
+                    groups.setdefault(c.category_id, []).append(c)
+                self._by_category = groups
+            return self._by_category.get(category_id, [])
+
+    def for_channels(self, channel_ids: Iterable[str]) -> List[LiveCard]:
+        """Live cards of the given channels that are live right now (set intersection)."""
+        with self._lock:
+            live = self._by_channel.keys() & channel_ids
+            return [self._cards[self._by_channel[cid]] for cid in live]
+
+    def live_channel_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._by_channel)
+
+    def _invalidate(self) -> None:
+        self._ranked = None
+        self._by_category = None
+
+    def stats(self) -> dict:
+        return {
+            "live_streams": len(self._cards),
+            "reloads": self.reloads,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 3) if self._loaded_at is not None else None,
+        }
+
+
+live_directory = LiveDirectory(refresh_seconds=settings.LIVE_DIRECTORY_REFRESH_SECONDS)
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.category import Category
+from app.models.stream import Stream
+from app.models.user import User
+
+# SQLite FTS5 index over user names, category names and live stream titles.
+# search_docs maps each (kind, ref_id) to the integer rowid of its FTS row, so a write
+# touches exactly one FTS row instead of scanning for it.
+DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS search_docs (
+        docid INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        ref_id TEXT NOT NULL,
+        UNIQUE (kind, ref_id)
+    )
+    """,
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(title, subtitle, tokenize='trigram')",
+]
+
+# Rows to index, as (ref_id, title, subtitle)
+_SOURCES = {
+    "user": "SELECT user_id AS ref_id, username AS title, display_name AS subtitle FROM users",
+    "category": "SELECT category_id AS ref_id, name AS title, NULL AS subtitle FROM categories",
+    "stream": (
+        "SELECT s.stream_id AS ref_id, s.title AS title, NULL AS subtitle FROM streams s "
+        "JOIN channels ch ON ch.channel_id = s.channel_id "
+        "WHERE s.ended_at IS NULL AND ch.is_live = 1"
+    ),
+}
+
+# How much a live stream's audience moves it up: bm25 - WEIGHT * viewers / (viewers + HALF)
+VIEWER_WEIGHT = 5.0
+VIEWER_HALF = 100.0
+
+# Trigram matching needs at least three characters
+MIN_QUERY_LEN = 3
+
+_ready = False
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+def detect_search_index(engine: Engine) -> None:
+    """Enables the index if init_db already created it; one catalog lookup at worker boot."""
+    global _ready
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect() as conn:
+        _ready = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")
+        ).first() is not None
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """Creates the FTS tables (SQLite only) and fills them from existing rows on first run."""
+    global _ready
+    if engine.dialect.name != "sqlite":
+        return
+
+    with engine.begin() as conn:
+        existed = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")
+        ).first() is not None
+        try:
+            for ddl in DDL:
+                conn.execute(text(ddl))
+        except Exception:
+            # SQLite built without FTS5 / trigram: search keeps using the LIKE fallback
+            return
+        if not existed:
+            _fill(conn)
+    _ready = True
+
+
+def rebuild_search_index(engine: Engine) -> None:
+    """Refills the index from the tables, for rows written without the ORM (bulk loads)."""
+    # Usually called by a script run after init_db, in a process that never created the index
+    detect_search_index(engine)
+    if not _ready:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM search_index"))
+        conn.execute(text("DELETE FROM search_docs"))
+        _fill(conn)
+
+
+def _fill(conn: Connection) -> None:
+    for kind, source in _SOURCES.items():
+        conn.execute(
+            text(f"INSERT OR IGNORE INTO search_docs (kind, ref_id) SELECT :kind, src.ref_id FROM ({source}) AS src"),
+            {"kind": kind},
+        )
+        conn.execute(
+            text(
+                "INSERT OR REPLACE INTO search_index (rowid, title, subtitle) "
+                f"SELECT d.docid, src.title, src.subtitle FROM ({source}) AS src "
+                "JOIN search_docs d ON d.kind = :kind AND d.ref_id = src.ref_id"
+            ),
+            {"kind": kind},
+        )
+
+
+def _upsert(conn: Connection, kind: str, ref_id: str, title: Optional[str], subtitle: Optional[str]) -> None:
+    conn.execute(
+        text("INSERT OR IGNORE INTO search_docs (kind, ref_id) VALUES (:kind, :ref_id)"),
+        {"kind": kind, "ref_id": ref_id},
+    )
+    conn.execute(
+        text(
+            "INSERT OR REPLACE INTO search_index (rowid, title, subtitle) "
+            "SELECT docid, :title, :subtitle FROM search_docs WHERE kind = :kind AND ref_id = :ref_id"
+        ),
+        {"kind": kind, "ref_id": ref_id, "title": title or "", "subtitle": subtitle or ""},
+    )
+
+
+def _remove(conn: Connection, kind: str, ref_id: str) -> None:
+    params = {"kind": kind, "ref_id": ref_id}
+    conn.execute(
+        text("DELETE FROM search_index WHERE rowid = (SELECT docid FROM search_docs WHERE kind = :kind AND ref_id = :ref_id)"),
+        params,
+    )
+    conn.execute(text("DELETE FROM search_docs WHERE kind = :kind AND ref_id = :ref_id"), params)
+
+
+def _changed(obj, *attrs: str) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+# Keep the index in the same transaction as the rows it describes.
+
+@event.listens_for(User, "after_insert")
+def _user_inserted(mapper, conn: Connection, u: User) -> None:
+    if _ready:
+        _upsert(conn, "user", u.user_id, u.username, u.display_name)
+
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, conn: Connection, u: User) -> None:
+    # follower_count / last_login updates don't touch the indexed text
+    if _ready and _changed(u, "username", "display_name"):
+        _upsert(conn, "user", u.user_id, u.username, u.display_name)
+
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, conn: Connection, u: User) -> None:
+    if _ready:
+        _remove(conn, "user", u.user_id)
+
+
+@event.listens_for(Category, "after_insert")
+@event.listens_for(Category, "after_update")
+def _category_written(mapper, conn: Connection, c: Category) -> None:
+    if _ready:
+        _upsert(conn, "category", c.category_id, c.name, None)
+
+
+@event.listens_for(Category, "after_delete")
+def _category_deleted(mapper, conn: Connection, c: Category) -> None:
+    if _ready:
+        _remove(conn, "category", c.category_id)
+
+
+@event.listens_for(Stream, "after_insert")
+@event.listens_for(Stream, "after_update")
+def _stream_written(mapper, conn: Connection, s: Stream) -> None:
+    # Only live streams are searchable
+    if not _ready or not _changed(s, "title", "ended_at"):
+        return
+    if s.ended_at is None:
+        _upsert(conn, "stream", s.stream_id, s.title, None)
+    else:
+        _remove(conn, "stream", s.stream_id)
+
+
+@event.listens_for(Stream, "after_delete")
+def _stream_deleted(mapper, conn: Connection, s: Stream) -> None:
+    if _ready:
+        _remove(conn, "stream", s.stream_id)
+
+
+def match(db: Session, query: str, limit: int, offset: int) -> List[Tuple[str, str]]:
+    """
+    Ranked (kind, ref_id) pairs for `query`, best first. Live streams are boosted by their
+    current viewer count on top of the bm25 text score.
+
+    Only the SEARCH_CANDIDATES best text matches (FTS5's top-k `ORDER BY rank LIMIT`) are
+    joined to search_docs, streams and channels and re-ranked with the boost, so the cost
+    doesn't grow with the number of matches.
+    """
+    phrase = '"' + query.replace('"', '""') + '"'
+    rows = db.execute(
+        text(
+            "SELECT d.kind, d.ref_id FROM ("
+            "SELECT rowid, rank FROM search_index WHERE search_index MATCH :q ORDER BY rank LIMIT :k"
+            ") AS m "
+            "JOIN search_docs d ON d.docid = m.rowid "
+            "LEFT JOIN streams s ON d.kind = 'stream' AND s.stream_id = d.ref_id "
+            "LEFT JOIN channels ch ON ch.channel_id = s.channel_id "
+            "ORDER BY m.rank - :w * (COALESCE(ch.current_viewer_count, 0) * 1.0 "
+            "/ (COALESCE(ch.current_viewer_count, 0) + :half)) "
+            "LIMIT :limit OFFSET :offset"
+        ),
+        {
+            "q": phrase,
+            "k": max(settings.SEARCH_CANDIDATES, offset + limit),
+            "w": VIEWER_WEIGHT,
+            "half": VIEWER_HALF,
+            "limit": limit,
+            "offset": offset,
+        },
+    ).all()
+    return [(r[0], r[1]) for r in rows]
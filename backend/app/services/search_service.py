@@ -1,41 +1,87 @@
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.models.category import Category
+from app.models.channel import Channel
+from app.models.stream import Stream
+from app.services import search_index
 
-def search(db: Session, query: str | None, category_id: str | None):
+def _user_result(u: User) -> dict:
+    return {
+        "type": "user",
+        "id": u.user_id,
+        "title": u.username,
+        "subtitle": u.bio or "",
+        "image": u.avatar_url,
+    }
+
+def _category_result(c: Category) -> dict:
+    return {
+        "type": "category",
+        "id": c.category_id,
+        "title": c.name,
+        "subtitle": f"{c.viewer_count} viewers",
+        "image": c.box_art,
+    }
+
+def _stream_result(s: Stream, ch: Channel, u: User) -> dict:
+    return {
+        "type": "stream",
+        "id": s.stream_id,
+        "title": s.title,
+        "subtitle": f"{u.display_name or u.username} · {ch.current_viewer_count or 0} viewers",
+        "image": s.thumbnail_url,
+    }
+
+def _indexed_search(db: Session, q: str, limit: int, offset: int) -> list:
+    """Ranked page from the FTS index, hydrated with one IN query per result type."""
+    hits = search_index.match(db, q, limit, offset)
+
+    ids: dict = {"user": [], "category": [], "stream": []}
+    for kind, ref_id in hits:
+        ids[kind].append(ref_id)
+
+    found = {}
+    if ids["user"]:
+        for u in db.query(User).filter(User.user_id.in_(ids["user"])).all():
+            found[("user", u.user_id)] = _user_result(u)
+    if ids["category"]:
+        for c in db.query(Category).filter(Category.category_id.in_(ids["category"])).all():
+            found[("category", c.category_id)] = _category_result(c)
+    if ids["stream"]:
+        rows = (
+            db.query(Stream, Channel, User)
+            .join(Channel, Channel.channel_id == Stream.channel_id)
+            .join(User, User.user_id == Channel.user_id)
+            .filter(Stream.stream_id.in_(ids["stream"]))
+            .all()
+        )
+        for s, ch, u in rows:
+            found[("stream", s.stream_id)] = _stream_result(s, ch, u)
+
+    return [found[h] for h in hits if h in found]
+
+def _like_search(db: Session, q: str, limit: int, offset: int) -> list:
+    # Fallback for short queries and databases without the FTS index
+    results = []
+    users = db.query(User).filter(User.username.ilike(f"%{q}%")).limit(offset + limit).all()
+    results.extend(_user_result(u) for u in users)
+    cats = db.query(Category).filter(Category.name.ilike(f"%{q}%")).limit(offset + limit).all()
+    results.extend(_category_result(c) for c in cats)
+    return results[offset:offset + limit]
+
+def search(db: Session, query: str | None, category_id: str | None, limit: int = 20, offset: int = 0):
     results = []
     q = (query or "").strip()
 
     if q:
-        users = db.query(User).filter(User.username.ilike(f"%{q}%")).limit(10).all()
-        for u in users:
-            results.append({
-                "type": "user",
-                "id": u.user_id,
-                "title": u.username,
-                "subtitle": u.bio or "",
-                "image": u.avatar_url,
-            })
-
-        cats = db.query(Category).filter(Category.name.ilike(f"%{q}%")).limit(10).all()
-        for c in cats:
-            results.append({
-                "type": "category",
-                "id": c.category_id,
-                "title": c.name,
-                "subtitle": f"{c.viewer_count} viewers",
-                "image": c.box_art,
-            })
-
-    if category_id:
+        if search_index.is_ready() and len(q) >= search_index.MIN_QUERY_LEN:
+            results = _indexed_search(db, q, limit, offset)
+        else:
+            results = _like_search(db, q, limit, offset)
+
+    if category_id and offset == 0:
         c = db.query(Category).filter(Category.category_id == category_id).first()
         if c:
-            results.insert(0, {
-                "type": "category",
-                "id": c.category_id,
-                "title": c.name,
-                "subtitle": f"{c.viewer_count} viewers",
-                "image": c.box_art,
-            })
-
-    return results[:20]
+            results.insert(0, _category_result(c))
+
+    return results[:limit]
@@ -3,8 +3,14 @@ from datetime import datetime, timezone
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
+from app.core.etag import versions
 from app.models.stream import Stream
 from app.models.channel import Channel
+from app.services.category_stats import Deltas, add_delta, apply_deltas_sql, category_stats
+from app.services.chat_broker import chat_broker
+from app.services.chat_history import chat_history
+from app.services.live_directory import live_directory
+from app.services.viewer_tracker import viewer_tracker
 
 PLACEHOLDER_THUMBS = [
     "https://images.unsplash.com/photo-1527443154391-507e9dc6c5cc?auto=format&fit=crop&w=1200&q=80",
@@ -40,9 +46,16 @@ def start_stream(
     channel.is_live = True
     channel.last_live_at = datetime.now(timezone.utc)
     channel.live_thumbnail_url = s.thumbnail_url
-    channel.current_viewer_count = 42  # demo
+    # Filled in from HLS traffic by viewer_tracker
+    channel.current_viewer_count = 0
+    deltas: Deltas = {}
+    add_delta(deltas, category_id, streamers=1)
+    apply_deltas_sql(db, deltas)
+    versions.bump(db, "streams", "channels")
     db.commit()
     db.refresh(s)
+    category_stats.apply(deltas)
+    live_directory.add_stream(db, s.stream_id)
     return s
 
 def stop_stream(db: Session, channel: Channel, stream_id: str) -> Stream:
@@ -54,9 +67,18 @@ def stop_stream(db: Session, channel: Channel, stream_id: str) -> Stream:
 
     s.ended_at = datetime.now(timezone.utc)
     channel.is_live = False
+    deltas: Deltas = {}
+    add_delta(deltas, s.category_id, viewers=-(channel.current_viewer_count or 0), streamers=-1)
     channel.current_viewer_count = 0
+    apply_deltas_sql(db, deltas)
+    versions.bump(db, "streams", "channels")
     db.commit()
     db.refresh(s)
+    category_stats.apply(deltas)
+    live_directory.remove(s.stream_id)
+    chat_broker.close_stream(s.stream_id)
+    chat_history.drop(s.stream_id)
+    viewer_tracker.forget(channel.stream_key)
     return s
 
 def list_live_streams(db: Session):
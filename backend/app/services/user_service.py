@@ -1,6 +1,9 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
+from app.core.auth_cache import invalidate_user
+from app.core.etag import versions
 from app.models.user import User
+from app.services import follow_feed
 
 def get_profile(db: Session, username: str) -> User:
     u = db.query(User).filter(User.username == username).first()
@@ -12,14 +15,27 @@ def update_profile(db: Session, actor: User, username: str, data: dict) -> User:
     if actor.username != username:
         raise HTTPException(status_code=403, detail="Not allowed")
 
+    # actor belongs to the auth (read) session; write through our own copy
+    u = db.get(User, actor.user_id)
+    if u is None:
+        raise HTTPException(status_code=404, detail="User not found")
     for k, v in data.items():
-        if v is not None and hasattr(actor, k):
-            setattr(actor, k, v)
+        if v is not None and hasattr(u, k):
+            setattr(u, k, v)
 
+    versions.bump(db, "users")
     db.commit()
-    db.refresh(actor)
-    return actor
+    invalidate_user(u.user_id)
+    db.refresh(u)
+    return u
 
 def delete_account(db: Session, actor: User) -> None:
-    db.delete(actor)
-    db.commit()
+    user_id = actor.user_id
+    u = db.get(User, user_id)
+    if u is not None:
+        db.delete(u)
+        # Cascades to the channel, its streams and clips
+        versions.bump(db, "users", "channels", "streams", "clips")
+        db.commit()
+    invalidate_user(user_id)
+    follow_feed.invalidate(user_id)
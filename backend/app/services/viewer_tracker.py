@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import re
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.etag import versions
+from app.db.session import SessionLocal
+from app.models.channel import Channel
+from app.models.stream import Stream
+from app.models.viewer_sketch import ViewerSketch
+from app.services.category_stats import Deltas, add_delta, apply_deltas_sql, category_stats
+from app.services.chat_history import naive_utc
+from app.services.live_directory import live_directory
+
+logger = logging.getLogger(__name__)
+
+_UUID_PREFIX = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+
+
+def stream_key_from_path(path: str) -> Optional[str]:
+    """
+    Stream key of an HLS path. nginx-rtmp names everything after the key:
+      <key>.m3u8, <key>-12.ts, <key>_720p2628kbs/index.m3u8, <key>_720p2628kbs/12.ts
+    """
+    head = path.lstrip("/").split("/", 1)[0]
+    m = _UUID_PREFIX.match(head)
+    if m:
+        return m.group(0)
+    key = re.split(r"[_.]", head, 1)[0]
+    return key or None
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """Distinct-count sketch: 2**p one-byte registers, about 1.04 / sqrt(2**p) relative error."""
+
+    __slots__ = ("p", "m", "registers")
+
+    def __init__(self, p: int):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    @classmethod
+    def from_registers(cls, p: int, registers: bytes) -> "HyperLogLog":
+        hll = cls(p)
+        hll.registers = bytearray(registers)
+        return hll
+
+    def add(self, value: str) -> None:
+        h = _hash64(value)
+        idx = h & (self.m - 1)
+        w = h >> self.p
+        rank = (64 - self.p) - w.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+
+class _StreamWindow:
+    """One sketch per time bucket; the window estimate is the union of the recent buckets."""
+
+    __slots__ = ("buckets",)
+
+    def __init__(self):
+        self.buckets: Dict[int, HyperLogLog] = {}
+
+    def add(self, bucket: int, viewer_id: str, p: int) -> None:
+        hll = self.buckets.get(bucket)
+        if hll is None:
+            hll = self.buckets[bucket] = HyperLogLog(p)
+        hll.add(viewer_id)
+
+    def union(self, oldest_bucket: int, p: int) -> Optional[HyperLogLog]:
+        for b in [b for b in self.buckets if b < oldest_bucket]:
+            del self.buckets[b]
+        if not self.buckets:
+            return None
+        union = HyperLogLog(p)
+        for hll in self.buckets.values():
+            union.merge(hll)
+        return union
+
+
+class ViewerTracker:
+    """
+    Concurrent-viewer counts derived from HLS proxy traffic.
+
+    Every playlist or segment fetch is attributed to its stream key and the client is added to
+    that stream's sliding-window sketch, which costs a hash and a byte compare per request. A
+    background thread turns the sketches into counts every `flush_seconds` and writes them with
+    one batched UPDATE per table: Channel.current_viewer_count, Stream.peak_viewers /
+    average_viewers (time-weighted since the stream started) and the category totals. The live
+    directory and category_stats are updated too.
+
+    With several workers each one sees part of the traffic: on flush a worker stores its window
+    sketches in viewer_sketches and counts every stream from the merged sketches of all workers
+    that flushed recently, so the numbers cover every viewer and a viewer whose requests reach
+    several workers counts once.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        buckets: int,
+        precision: int,
+        flush_seconds: float,
+        max_streams: int,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.enabled = settings.VIEWER_TRACKING_ENABLED
+        self.worker_id = secrets.token_hex(8)
+        self.window_seconds = window_seconds
+        self.buckets = max(1, buckets)
+        self.bucket_seconds = window_seconds / self.buckets
+        self.precision = min(16, max(4, precision))
+        self.flush_seconds = flush_seconds
+        self.max_streams = max_streams
+        self.session_factory = session_factory
+
+        self._windows: Dict[str, _StreamWindow] = {}
+        self._lock = threading.Lock()
+        # Keys written with a non-zero count last time, so they are brought back down to 0
+        self._reported: Set[str] = set()
+        # Whether viewer_sketches holds rows of this worker, which a flush must replace or remove
+        self._stored = False
+        self._last_flush: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.records = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+
+    def _bucket(self, now: float) -> int:
+        return int(now / self.bucket_seconds)
+
+    def record(self, stream_key: Optional[str], viewer_id: str) -> None:
+        if not self.enabled or not stream_key:
+            return
+        bucket = self._bucket(time.monotonic())
+        with self._lock:
+            window = self._windows.get(stream_key)
+            if window is None:
+                # Keys come from URLs, so bound how many unknown ones we keep until the next flush
+                if len(self._windows) >= self.max_streams:
+                    self.rejected += 1
+                    return
+                window = self._windows[stream_key] = _StreamWindow()
+            window.add(bucket, viewer_id, self.precision)
+            self.records += 1
+
+    def forget(self, stream_key: Optional[str]) -> None:
+        with self._lock:
+            self._windows.pop(stream_key, None)
+            self._reported.discard(stream_key)
+
+    def sketches(self) -> Dict[str, HyperLogLog]:
+        """This worker's window sketch per stream key; streams without traffic in the window are dropped."""
+        oldest = self._bucket(time.monotonic()) - self.buckets + 1
+        out: Dict[str, HyperLogLog] = {}
+        with self._lock:
+            for key, window in list(self._windows.items()):
+                union = window.union(oldest, self.precision)
+                if union is not None:
+                    out[key] = union
+                else:
+                    del self._windows[key]
+        return out
+
+    def counts(self) -> Dict[str, int]:
+        """Current estimate per stream key from this worker's traffic only."""
+        return {key: hll.estimate() for key, hll in self.sketches().items()}
+
+    def _share(self, db: Session, local: Dict[str, HyperLogLog], keys: Iterable[str], now: datetime) -> Dict[str, int]:
+        """Replaces this worker's stored sketches with `local`; returns the counts of `keys` over all workers."""
+        t = ViewerSketch.__table__
+        # Rows of workers that stopped flushing (e.g. exited) no longer count
+        cutoff = now - timedelta(seconds=self.window_seconds + 2 * self.flush_seconds)
+        db.execute(delete(t).where(or_(t.c.worker_id == self.worker_id, t.c.updated_at < cutoff)))
+        if local:
+            db.execute(insert(t), [
+                {"stream_key": key, "worker_id": self.worker_id, "registers": bytes(hll.registers), "updated_at": now}
+                for key, hll in local.items()
+            ])
+        merged: Dict[str, HyperLogLog] = {}
+        for key, registers in db.execute(select(t.c.stream_key, t.c.registers).where(t.c.stream_key.in_(list(keys)))):
+            if len(registers) != 1 << self.precision:
+                # Written by a worker configured with another VIEWER_SKETCH_PRECISION
+                continue
+            hll = HyperLogLog.from_registers(self.precision, registers)
+            if key in merged:
+                merged[key].merge(hll)
+            else:
+                merged[key] = hll
+        return {key: hll.estimate() for key, hll in merged.items()}
+
+    def start(self) -> None:
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="viewer-tracker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        thread = self._thread
+        self._thread = None
+        if thread is not None and thread.is_alive():
+            self._stop.set()
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception:
+                self.failed_flushes += 1
+                logger.exception("viewer count flush failed")
+
+    def flush(self) -> None:
+        started = time.perf_counter()
+        now_mono = time.monotonic()
+        interval = now_mono - self._last_flush if self._last_flush is not None else self.flush_seconds
+        self._last_flush = now_mono
+
+        local = self.sketches()
+        keys = set(local) | self._reported
+        if not keys and not self._stored:
+            return
+
+        now = naive_utc(datetime.now(timezone.utc))
+        db = self.session_factory()
+        try:
+            counts = self._share(db, local, keys, now)
+            rows = db.execute(
+                select(
+                    Channel.channel_id, Channel.stream_key, Channel.current_viewer_count, Stream.stream_id,
+                    Stream.category_id, Stream.started_at, Stream.peak_viewers, Stream.average_viewers,
+                )
+                .join(Stream, Stream.channel_id == Channel.channel_id)
+                .where(Channel.stream_key.in_(keys), Channel.is_live == True, Stream.ended_at.is_(None))
+            ).all()
+
+            channel_rows = []
+            stream_rows = []
+            deltas: Deltas = {}
+            changed = False
+            live_keys = set()
+            for channel_id, key, previous, stream_id, category_id, started_at, peak, avg in rows:
+                live_keys.add(key)
+                n = counts.get(key, 0)
+                add_delta(deltas, category_id, viewers=n - (previous or 0))
+                changed = changed or n != (previous or 0)
+                elapsed = (now - naive_utc(started_at)).total_seconds() if started_at else interval
+                weight = min(1.0, interval / elapsed) if elapsed > 0 else 1.0
+                avg = avg or 0
+                channel_rows.append({"channel_id": channel_id, "current_viewer_count": n})
+                stream_rows.append({
+                    "stream_id": stream_id,
+                    "peak_viewers": max(peak or 0, n),
+                    "average_viewers": int(round(avg + (n - avg) * weight)),
+                })
+
+            # ORM bulk UPDATE by primary key: one executemany per table
+            if channel_rows:
+                db.execute(update(Channel), channel_rows)
+                db.execute(update(Stream), stream_rows)
+            apply_deltas_sql(db, deltas)
+            if changed:
+                versions.bump(db, "streams", "channels")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        self._stored = bool(local)
+        category_stats.apply(deltas)
+        for row in channel_rows:
+            live_directory.set_viewers(row["channel_id"], row["current_viewer_count"])
+        with self._lock:
+            # Keys that aren't live streams (ended, or never existed) stop being tracked
+            for key in set(counts) - live_keys:
+                self._windows.pop(key, None)
+            self._reported = {k for k in live_keys if counts.get(k)}
+
+        self.flushes += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000.0
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "worker_id": self.worker_id,
+            "streams": len(self._windows),
+            "records": self.records,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+
+viewer_tracker = ViewerTracker(
+    window_seconds=settings.VIEWER_WINDOW_SECONDS,
+    buckets=settings.VIEWER_WINDOW_BUCKETS,
+    precision=settings.VIEWER_SKETCH_PRECISION,
+    flush_seconds=settings.VIEWER_FLUSH_SECONDS,
+    max_streams=settings.VIEWER_MAX_STREAMS,
+)
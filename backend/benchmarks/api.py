@@ -0,0 +1,331 @@
+"""
+Latency, throughput and SQL query counts of the hot endpoints, driving the ASGI app in-process
+through httpx's ASGITransport (no server or network), against a generated dataset.
+
+    cd backend && python -m benchmarks.api [--db /tmp/devolo-bench.db] [--requests 300] [--concurrency 8]
+    cd backend && python -m benchmarks.api --save-baseline   # record benchmarks/baseline.json
+
+A missing --db is filled first with `python -m app.seed.generate` (--users and friends are
+passed on). Each endpoint gets a warm-up, then --requests requests from --concurrency
+concurrent clients. Statements are counted by a before_cursor_execute listener and charged to
+the request that issued them (background flushes aren't counted).
+
+Results are compared with the baseline file: p50/p95 more than --tolerance above it, or more
+SQL statements per request than it recorded, are regressions and make the exit status 1.
+Latencies only compare meaningfully on the machine and dataset that recorded the baseline.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextvars
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from itertools import count
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_DB = "/tmp/devolo-bench.db"
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Statement counter of the request being measured; copied into threadpool and greenlet calls
+_queries: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("bench_queries", default=None)
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # Request number -> (path, json body)
+    request: Callable[[int], tuple]
+    auth: bool = False
+    # Endpoints dominated by deliberate work (Argon2) run fewer requests
+    max_requests: Optional[int] = None
+
+
+@dataclass
+class Result:
+    requests: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    rps: float
+    queries_per_request: float
+    errors: Dict[str, int] = field(default_factory=dict)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100.0 * len(sorted_values)) - 1)]
+
+
+def ensure_dataset(args: argparse.Namespace) -> None:
+    if os.path.exists(args.db):
+        return
+    print(f"generating {args.db} ...", flush=True)
+    subprocess.run(
+        [
+            sys.executable, "-m", "app.seed.generate", "--seed", str(args.seed),
+            "--users", str(args.users), "--live", str(args.live), "--chat", str(args.chat),
+            "--clips", str(args.clips),
+        ],
+        env=os.environ, check=True,
+    )
+
+
+def count_queries() -> None:
+    from sqlalchemy import event
+
+    from app.db.session import async_engine, engine, read_engine
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counter = _queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+    for e in {engine, read_engine, async_engine.sync_engine}:
+        event.listen(e, "before_cursor_execute", on_execute)
+
+
+def dataset_info() -> dict:
+    from sqlalchemy import func, select
+
+    from app.db.session import engine
+    from app.models.clip import Clip
+    from app.models.follow import Follow
+    from app.models.stream import Stream
+    from app.models.user import User
+
+    # Tables the benchmark doesn't write to (chat grows with every run)
+    with engine.connect() as conn:
+        def n(model, *where):
+            return conn.execute(select(func.count()).select_from(model).where(*where)).scalar()
+
+        return {
+            "users": n(User),
+            "follows": n(Follow),
+            "live_streams": n(Stream, Stream.ended_at.is_(None)),
+            "clips": n(Clip),
+        }
+
+
+def fixtures() -> dict:
+    from sqlalchemy import select
+
+    from app.db.session import engine
+    from app.models.channel import Channel
+    from app.models.stream import Stream
+    from app.models.user import User
+
+    with engine.connect() as conn:
+        live = conn.execute(
+            select(Stream.stream_id)
+            .join(Channel, Channel.channel_id == Stream.channel_id)
+            .where(Stream.ended_at.is_(None), Channel.is_live == True)
+            .order_by(Channel.current_viewer_count.desc())
+            .limit(50)
+        ).scalars().all()
+        emails = conn.execute(select(User.email).order_by(User.username).limit(1)).scalars().all()
+    if not live or not emails:
+        raise SystemExit("the dataset needs live streams and users; regenerate it")
+    return {"live": live, "email": emails[0]}
+
+
+def scenarios(fx: dict) -> List[Scenario]:
+    live = fx["live"]
+    terms = ["user00", "Category", "Live now", "neon", "Past"]
+
+    def pick(i: int) -> str:
+        return live[i % len(live)]
+
+    return [
+        Scenario("GET /home", "GET", lambda i: ("/home", None)),
+        Scenario("GET /streams/live", "GET", lambda i: ("/streams/live", None)),
+        Scenario("GET /streams/{id}", "GET", lambda i: (f"/streams/{pick(i)}", None)),
+        Scenario("GET /streams/{id}/chat", "GET", lambda i: (f"/streams/{pick(i)}/chat", None)),
+        Scenario(
+            "POST /streams/{id}/chat", "POST",
+            lambda i: (f"/streams/{pick(i)}/chat", {"content": f"benchmark message {i}"}),
+            auth=True,
+        ),
+        Scenario("GET /categories/samples", "GET", lambda i: ("/categories/samples", None)),
+        Scenario("GET /channels/recommended", "GET", lambda i: ("/channels/recommended", None)),
+        Scenario("GET /search", "GET", lambda i: (f"/search?query={terms[i % len(terms)]}", None)),
+        Scenario(
+            "POST /auth/login", "POST",
+            lambda i: ("/auth/login", {"email": fx["email"], "password": "password123"}),
+            max_requests=40,
+        ),
+    ]
+
+
+async def run_scenario(client, scenario: Scenario, headers: dict, requests: int, concurrency: int, warmup: int) -> Result:
+    requests = min(requests, scenario.max_requests or requests)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    queries = [0]
+
+    async def one(i: int, measure: bool) -> None:
+        path, body = scenario.request(i)
+        token = _queries.set(queries if measure else None)
+        try:
+            started = time.perf_counter()
+            r = await client.request(scenario.method, path, json=body, headers=headers if scenario.auth else None)
+            elapsed = time.perf_counter() - started
+        finally:
+            _queries.reset(token)
+        if r.status_code >= 400:
+            errors[str(r.status_code)] = errors.get(str(r.status_code), 0) + 1
+        if measure:
+            latencies.append(elapsed * 1000.0)
+
+    for i in range(warmup):
+        await one(i, measure=False)
+
+    ids = count()
+
+    async def worker() -> None:
+        while (i := next(ids)) < requests:
+            await one(warmup + i, measure=True)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return Result(
+        requests=requests,
+        p50_ms=round(percentile(latencies, 50), 3),
+        p95_ms=round(percentile(latencies, 95), 3),
+        p99_ms=round(percentile(latencies, 99), 3),
+        rps=round(requests / wall, 1) if wall > 0 else 0.0,
+        queries_per_request=round(queries[0] / requests, 2) if requests else 0.0,
+        errors=errors,
+    )
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Result]:
+    import httpx
+
+    from app.main import app
+
+    fx = fixtures()
+    selected = [s for s in scenarios(fx) if not args.only or any(o in s.name for o in args.only)]
+    results: Dict[str, Result] = {}
+
+    # ASGITransport doesn't send lifespan events; the background writers have to run
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            r = await client.post("/auth/login", json={"email": fx["email"], "password": "password123"})
+            r.raise_for_status()
+            headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+            print(f"{'endpoint':<28}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'queries':>9}", flush=True)
+            for s in selected:
+                res = await run_scenario(client, s, headers, args.requests, args.concurrency, args.warmup)
+                results[s.name] = res
+                errors = f"  errors {res.errors}" if res.errors else ""
+                print(
+                    f"{s.name:<28}{res.p50_ms:>9.2f}{res.p95_ms:>9.2f}{res.p99_ms:>9.2f}"
+                    f"{res.rps:>9.0f}{res.queries_per_request:>9.2f}{errors}",
+                    flush=True,
+                )
+    return results
+
+
+def compare(results: Dict[str, Result], baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get("endpoints", {}).get(name)
+        if base is None:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if getattr(res, key) > base[key] * (1.0 + tolerance):
+                regressions.append(f"{name}: {key} {getattr(res, key):.2f} vs baseline {base[key]:.2f}")
+        # Query counts don't depend on the machine, so any increase counts
+        if res.queries_per_request > base["queries_per_request"] + 0.01:
+            regressions.append(
+                f"{name}: {res.queries_per_request:.2f} queries/request vs baseline {base['queries_per_request']:.2f}"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite file to benchmark against (generated if missing)")
+    parser.add_argument("--requests", type=int, default=300, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--only", nargs="*", help="endpoints whose name contains any of these")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed p50/p95 slowdown, as a fraction")
+    # Passed to app.seed.generate when --db doesn't exist yet
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--live", type=int, default=1_000)
+    parser.add_argument("--chat", type=int, default=500_000)
+    parser.add_argument("--clips", type=int, default=50_000)
+    args = parser.parse_args()
+
+    # Settings are read at import time, so the app comes in only after this
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    ensure_dataset(args)
+    count_queries()
+    dataset = dataset_info()
+
+    results = asyncio.run(run(args))
+
+    failed = [name for name, res in results.items() if res.errors]
+    if failed:
+        print(f"\nFAILED: error responses from {', '.join(failed)}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {
+                    "meta": {
+                        "python": platform.python_version(),
+                        "machine": platform.machine(),
+                        "requests": args.requests,
+                        "concurrency": args.concurrency,
+                        "dataset": dataset,
+                    },
+                    "endpoints": {name: {k: v for k, v in asdict(res).items() if k != "errors"} for name, res in results.items()},
+                },
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"\nbaseline written to {args.baseline}")
+        sys.exit(1 if failed else 0)
+
+    regressions: List[str] = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("dataset") != dataset:
+            print(f"\nnote: the baseline was recorded on a different dataset: {baseline.get('meta', {}).get('dataset')}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS against " + args.baseline)
+            for line in regressions:
+                print("  " + line)
+        else:
+            print(f"\nno regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    else:
+        print(f"\nno baseline at {args.baseline}; record one with --save-baseline")
+
+    sys.exit(1 if failed or regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Serialization cost of the list endpoints: the previous path (a dict per row, then FastAPI's
+jsonable_encoder and JSONResponse's json.dumps) against the compiled card serializers and
+ORJSONResponse. No database or server involved; only the bytes each endpoint renders. Query
+results are stood in for by namedtuples (attribute access and _asdict, like SQLAlchemy rows) and
+ORM objects by SimpleNamespace graphs; both paths must render the same bytes.
+
+    cd backend && python -m benchmarks.serialization [--items 500] [--repeat 200]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.serialization import (
+    CATEGORY_CARD,
+    CHAT_ITEM,
+    CLIP_CARD,
+    HOME_CLIP_CARD,
+    HOME_STREAM_CARD,
+    LIVE_STREAM_CARD,
+    json_response,
+    serialize_all,
+)
+from app.services.category_stats import CategoryAggregate
+from app.services.live_directory import LiveCard
+
+ClipRow = namedtuple("ClipRow", [
+    "clip_id", "title", "thumbnail_url", "duration_seconds", "view_count", "stream_id", "channel_id",
+    "channel_username", "channel_display_name", "channel_avatar_url", "category_id", "category_name",
+])
+ChatRow = namedtuple("ChatRow", [
+    "message_id", "stream_id", "user_id", "username", "display_name", "avatar_url", "content", "created_at", "seq",
+])
+
+
+def live_cards(n: int):
+    return [
+        LiveCard(
+            stream_id=f"stream-{i}",
+            title=f"Stream number {i} with a reasonably long title",
+            thumbnail_url=f"https://img.example.com/thumbs/{i}.jpg",
+            started_at=str(datetime(2024, 1, 1) + timedelta(minutes=i)),
+            channel_id=f"channel-{i}",
+            user_id=f"user-{i}",
+            channel_username=f"streamer{i}",
+            channel_display_name=f"Streamer {i}",
+            channel_avatar_url=f"https://img.example.com/avatars/{i}.png",
+            viewer_count=10_000 - i,
+            category_id=f"category-{i % 40}",
+            category_name=f"Category {i % 40}",
+        )
+        for i in range(n)
+    ]
+
+
+def clip_rows(n: int):
+    """Rows of clip_service's joined query / the /home clip query."""
+    return [
+        ClipRow(
+            clip_id=f"clip-{i}",
+            title=f"Clip {i}",
+            thumbnail_url=f"https://img.example.com/clips/{i}.jpg",
+            duration_seconds=30 + i % 60,
+            view_count=100_000 - i,
+            stream_id=f"stream-{i}",
+            channel_id=f"channel-{i}",
+            channel_username=f"streamer{i}",
+            channel_display_name=f"Streamer {i}",
+            channel_avatar_url=f"https://img.example.com/avatars/{i}.png",
+            category_id=f"category-{i % 40}",
+            category_name=f"Category {i % 40}",
+        )
+        for i in range(n)
+    ]
+
+
+def clip_objects(rows):
+    """The same clips as Clip objects with stream -> channel -> user loaded, as /clips had them."""
+    return [
+        SimpleNamespace(
+            clip_id=r.clip_id,
+            title=r.title,
+            thumbnail_url=r.thumbnail_url,
+            duration_seconds=r.duration_seconds,
+            view_count=r.view_count,
+            stream=SimpleNamespace(
+                category_id=r.category_id,
+                channel=SimpleNamespace(
+                    user=SimpleNamespace(
+                        username=r.channel_username,
+                        display_name=r.channel_display_name,
+                        avatar_url=r.channel_avatar_url,
+                    ),
+                ),
+            ),
+        )
+        for r in rows
+    ]
+
+
+def chat_rows(n: int):
+    base = datetime(2024, 1, 1)
+    return [
+        ChatRow(
+            message_id=f"message-{i}",
+            stream_id="stream-1",
+            user_id=f"user-{i % 50}",
+            username=f"viewer{i % 50}",
+            display_name=f"Viewer {i % 50}",
+            avatar_url=None,
+            content="gg that was a great play " * 2,
+            created_at=base + timedelta(seconds=i, microseconds=i),
+            seq=i + 1,
+        )
+        for i in range(n)
+    ]
+
+
+def chat_pairs(rows):
+    """The same messages as the (ChatMessage, User) pairs the chat query returned."""
+    return [
+        (
+            SimpleNamespace(
+                message_id=r.message_id, stream_id=r.stream_id, user_id=r.user_id,
+                content=r.content, created_at=r.created_at, seq=r.seq,
+            ),
+            SimpleNamespace(username=r.username, display_name=r.display_name, avatar_url=r.avatar_url),
+        )
+        for r in rows
+    ]
+
+
+# The hand-written code the routes used before
+
+def old_cards(cards, viewer_key: str):
+    items = []
+    for c in cards:
+        items.append({
+            "stream_id": c.stream_id,
+            "title": c.title,
+            "thumbnail_url": c.thumbnail_url,
+            "started_at": c.started_at,
+            "channel_id": c.channel_id,
+            "channel_username": c.channel_username,
+            "channel_display_name": c.channel_display_name,
+            "channel_avatar_url": c.channel_avatar_url,
+            viewer_key: c.viewer_count,
+            "category_id": c.category_id,
+            "category_name": c.category_name,
+        })
+    return items
+
+
+def old_home(cards, clips):
+    return {"live": old_cards(cards, "viewer_count"), "clips": [row._asdict() for row in clips]}
+
+
+def old_categories(cats):
+    return {"items": [
+        {
+            "category_id": c.category_id,
+            "name": c.name,
+            "box_art": c.box_art,
+            "viewer_count": c.viewer_count,
+            "streamer_count": c.streamer_count,
+        }
+        for c in cats
+    ]}
+
+
+def old_clip_card(category_names, c):
+    s = c.stream
+    ch = s.channel if s else None
+    u = ch.user if ch else None
+    return {
+        "clip_id": c.clip_id,
+        "title": c.title,
+        "thumbnail_url": c.thumbnail_url,
+        "duration_seconds": c.duration_seconds,
+        "view_count": c.view_count or 0,
+        "channel": {
+            "username": u.username,
+            "display_name": (u.display_name or u.username),
+            "avatar_url": u.avatar_url,
+        }
+        if u
+        else None,
+        "category": {
+            "category_id": (s.category_id if s else None),
+            "name": (category_names.get(s.category_id) if s else None),
+        },
+    }
+
+
+def old_chat_item(m, u):
+    return {
+        "message_id": m.message_id,
+        "stream_id": m.stream_id,
+        "user_id": m.user_id,
+        "username": u.username,
+        "display_name": u.display_name or u.username,
+        "avatar_url": u.avatar_url,
+        "content": m.content,
+        "created_at": m.created_at.isoformat() if m.created_at else None,
+        "seq": m.seq,
+    }
+
+
+def chat_page(items):
+    return {"items": items, "next_cursor": "x", "prev_cursor": "y"}
+
+
+def old_response(payload) -> bytes:
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def new_response(payload) -> bytes:
+    return json_response(payload).body
+
+
+def bench(fn, repeat: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=500, help="rows per list endpoint")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    cards = live_cards(args.items)
+    home_clips = clip_rows(20)
+    cats = [CategoryAggregate(f"category-{i}", f"Category {i}", f"https://img.example.com/box/{i}.jpg", 1000 - i, i) for i in range(args.items)]
+    # Page sizes are capped by the routes
+    clips = clip_rows(min(args.items, 100))
+    clip_objs = clip_objects(clips)
+    category_names = {c.category_id: c.category_name for c in clips}
+    chat = chat_rows(min(args.items, 200))
+    chat_objs = chat_pairs(chat)
+
+    cases = {
+        "/streams/live": (
+            lambda: old_response({"items": old_cards(cards, "current_viewer_count")}),
+            lambda: new_response({"items": serialize_all(LIVE_STREAM_CARD, cards)}),
+        ),
+        "/home": (
+            lambda: old_response(old_home(cards[:9], home_clips)),
+            lambda: new_response({
+                "live": serialize_all(HOME_STREAM_CARD, cards[:9]),
+                "clips": serialize_all(HOME_CLIP_CARD, home_clips),
+            }),
+        ),
+        "/categories": (
+            lambda: old_response(old_categories(cats)),
+            lambda: new_response({"items": serialize_all(CATEGORY_CARD, cats)}),
+        ),
+        "/clips": (
+            lambda: old_response([old_clip_card(category_names, c) for c in clip_objs]),
+            lambda: new_response(serialize_all(CLIP_CARD, clips)),
+        ),
+        "/streams/{id}/chat": (
+            lambda: old_response(chat_page([old_chat_item(m, u) for m, u in chat_objs])),
+            lambda: new_response(chat_page(serialize_all(CHAT_ITEM, chat))),
+        ),
+    }
+
+    print(f"{'endpoint':<22}{'before us':>12}{'after us':>12}{'speedup':>10}")
+    for name, (old, new) in cases.items():
+        assert old() == new(), f"{name}: the two paths render different bytes"
+        before = bench(old, args.repeat)
+        after = bench(new, args.repeat)
+        print(f"{name:<22}{before:>12.1f}{after:>12.1f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
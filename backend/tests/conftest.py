@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+# Settings are read when app modules are imported, so point them at a scratch database first
+_tmp = tempfile.mkdtemp(prefix="devolo-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
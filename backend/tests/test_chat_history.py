@@ -0,0 +1,127 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from app.db.session import SessionLocal
+from app.models.chat_message import ChatMessage
+from app.services.chat_history import ChatHistory, chat_history, decode_cursor, encode_cursor
+
+
+def msg(seq: int) -> tuple:
+    return seq, {"message_id": f"m{seq}", "seq": seq}
+
+
+def warm(history: ChatHistory, stream_id: str, seqs) -> None:
+    history.begin_warm(stream_id)
+    history.finish_warm(stream_id, [msg(s) for s in seqs])
+
+
+def seqs(rows) -> list:
+    return [k for k, _ in rows]
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(12345)) == 12345
+    with pytest.raises(HTTPException):
+        decode_cursor("not a cursor")
+
+
+def test_window_latest_after_before():
+    h = ChatHistory(size=10, max_streams=10, refresh_seconds=60)
+    warm(h, "s", range(1, 6))
+
+    assert seqs(h.window("s", 3)) == [3, 4, 5]
+    assert seqs(h.window("s", 2, after=2)) == [3, 4]
+    assert seqs(h.window("s", 10, after=5)) == []
+    assert seqs(h.window("s", 2, before=3)) == [1, 2]
+
+
+def test_window_falls_back_when_the_ring_does_not_cover_it():
+    h = ChatHistory(size=3, max_streams=10, refresh_seconds=60)
+    # The newest 3 of a longer history: older pages aren't in memory
+    warm(h, "s", [8, 9, 10])
+
+    assert h.window("s", 5, after=3) is None
+    assert h.window("s", 2, before=8) is None
+    assert seqs(h.window("s", 2, after=8)) == [9, 10]
+    assert h.window("cold", 5) is None
+
+
+def test_append_in_order_and_gap_drops_ring():
+    h = ChatHistory(size=10, max_streams=10, refresh_seconds=60)
+    warm(h, "s", [1, 2])
+
+    h.append("s", 3, msg(3)[1])
+    h.append("s", 3, msg(3)[1])  # repeated: ignored
+    assert seqs(h.window("s", 10)) == [1, 2, 3]
+
+    # 4 was committed elsewhere: serving 5 after 3 would hide it
+    h.append("s", 5, msg(5)[1])
+    assert not h.is_warm("s")
+
+
+def test_finish_warm_merges_appends_made_during_the_load():
+    h = ChatHistory(size=10, max_streams=10, refresh_seconds=60)
+    h.begin_warm("s")
+    h.append("s", 3, msg(3)[1])
+    h.finish_warm("s", [msg(1), msg(2), msg(3)])
+    assert seqs(h.window("s", 10)) == [1, 2, 3]
+
+    h.begin_warm("t")
+    h.append("t", 5, msg(5)[1])
+    h.finish_warm("t", [msg(1), msg(2), msg(3)])
+    assert not h.is_warm("t")
+
+
+def test_confirm_drops_a_ring_behind_the_database():
+    h = ChatHistory(size=10, max_streams=10, refresh_seconds=0)
+    warm(h, "s", [1, 2])
+
+    assert h.unchecked_last("s") == 2
+    h.confirm("s", 2)
+    assert h.is_warm("s")
+
+    assert h.unchecked_last("s") == 2
+    h.confirm("s", 3)
+    assert not h.is_warm("s")
+
+
+def test_fresh_ring_is_not_checked():
+    h = ChatHistory(size=10, max_streams=10, refresh_seconds=60)
+    warm(h, "s", [1])
+    assert h.unchecked_last("s") is None
+
+
+def test_messages_committed_by_another_worker_show_up(client, monkeypatch):
+    r = client.post("/auth/login", json={"email": "neonwolf@example.com", "password": "password123"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    stream_id = client.get("/streams/live").json()["items"][0]["stream_id"]
+
+    sent = client.post(f"/streams/{stream_id}/chat", json={"content": "from this worker"}, headers=headers)
+    assert sent.status_code == 200
+    latest = client.get(f"/streams/{stream_id}/chat").json()
+    assert latest["items"][-1]["content"] == "from this worker"
+
+    # Written by "another worker": this process's ring never sees an append for it
+    db = SessionLocal()
+    try:
+        seq = db.execute(select(func.max(ChatMessage.seq)).where(ChatMessage.stream_id == stream_id)).scalar() + 1
+        db.add(ChatMessage(
+            message_id=str(uuid.uuid4()),
+            stream_id=stream_id,
+            user_id=sent.json()["message"]["user_id"],
+            content="from another worker",
+            created_at=datetime.now(timezone.utc),
+            seq=seq,
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+    monkeypatch.setattr(chat_history, "refresh_seconds", 0.0)
+    polled = client.get(f"/streams/{stream_id}/chat", params={"after": latest["next_cursor"]}).json()
+    assert [m["content"] for m in polled["items"]] == ["from another worker"]
+    assert polled["items"][0]["seq"] == seq
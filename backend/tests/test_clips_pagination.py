@@ -0,0 +1,98 @@
+import uuid
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.db.session import SessionLocal, async_engine, engine, read_engine
+from app.models.clip import Clip
+from app.models.user import User
+
+
+@contextmanager
+def count_statements():
+    counter = [0]
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counter[0] += 1
+
+    engines = {engine, read_engine, async_engine.sync_engine}
+    for e in engines:
+        event.listen(e, "before_cursor_execute", on_execute)
+    try:
+        yield counter
+    finally:
+        for e in engines:
+            event.remove(e, "before_cursor_execute", on_execute)
+
+
+def add_clips(n: int) -> None:
+    """n clips on the seeded streams, with plenty of view_count ties to page through."""
+    db = SessionLocal()
+    try:
+        seeded = db.query(Clip).first()
+        creator = db.query(User).filter(User.user_id == seeded.creator_id).one()
+        db.add_all(
+            Clip(
+                clip_id=str(uuid.uuid4()),
+                stream_id=seeded.stream_id,
+                creator_id=creator.user_id,
+                title=f"Paged clip {i}",
+                clip_url="https://example.com/clip.mp4",
+                duration_seconds=30,
+                view_count=i % 5,
+            )
+            for i in range(n)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def fetch_pages(client, path: str, limit: int):
+    """Follows X-Next-Cursor to the end; returns (clip ids in order, statements per page)."""
+    ids, per_page = [], []
+    cursor = None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        with count_statements() as counter:
+            r = client.get(path, params=params)
+        assert r.status_code == 200, r.text
+        ids += [c["clip_id"] for c in r.json()]
+        per_page.append(counter[0])
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids, per_page
+
+
+def test_clip_pages_cost_the_same_number_of_queries(client):
+    add_clips(60)
+    client.get("/clips")  # warms category_stats
+
+    ids, per_page = fetch_pages(client, "/clips", limit=7)
+
+    assert len(per_page) > 5
+    assert set(per_page) == {per_page[0]}, per_page
+    # The ETag's read of entity_versions and the page itself
+    assert per_page[0] == 2
+
+
+def test_clip_pages_cover_every_clip_once_in_order(client):
+    ids, _ = fetch_pages(client, "/clips", limit=7)
+
+    db = SessionLocal()
+    try:
+        expected = [
+            cid for cid, in db.query(Clip.clip_id).order_by(Clip.view_count.desc(), Clip.clip_id.desc())
+        ]
+    finally:
+        db.close()
+    assert ids == expected
+
+
+def test_profile_clip_pages_cost_the_same_number_of_queries(client):
+    username = client.get("/clips", params={"limit": 1}).json()[0]["channel"]["username"]
+
+    _, per_page = fetch_pages(client, f"/profile/{username}/clips", limit=3)
+
+    assert len(per_page) > 2
+    assert set(per_page) == {per_page[0]}, per_page
@@ -0,0 +1,58 @@
+from app.core.etag import versions
+from app.db.session import SessionLocal
+from app.models.user import User
+from app.services.clip_views import clip_views
+
+
+def test_unchanged_data_answers_304(client):
+    first = client.get("/clips")
+    again = client.get("/clips", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+
+def test_write_committed_by_another_worker_changes_the_tag(client):
+    username = client.get("/clips", params={"limit": 1}).json()[0]["channel"]["username"]
+    path = f"/profile/{username}"
+    first = client.get(path)
+
+    # Another worker's write: nothing in this process is told about it
+    db = SessionLocal()
+    try:
+        u = db.query(User).filter(User.username == username).one()
+        u.bio = "Changed elsewhere"
+        versions.bump(db, "users")
+        db.commit()
+    finally:
+        db.close()
+
+    again = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 200
+    assert again.headers["ETag"] != first.headers["ETag"]
+    assert again.json()["bio"] == "Changed elsewhere"
+
+
+def test_rolled_back_write_keeps_the_tag(client):
+    first = client.get("/clips")
+    db = SessionLocal()
+    try:
+        versions.bump(db, "clips")
+        db.rollback()
+    finally:
+        db.close()
+    assert client.get("/clips").headers["ETag"] == first.headers["ETag"]
+
+
+def test_clip_views_change_the_tag_and_the_body_together(client):
+    first = client.get("/clips")
+    clip = first.json()[0]
+    assert clip_views.record(clip["clip_id"])
+
+    pending = client.get("/clips", headers={"If-None-Match": first.headers["ETag"]})
+    assert pending.status_code == 304
+
+    clip_views.flush()
+    flushed = client.get("/clips", headers={"If-None-Match": first.headers["ETag"]})
+    assert flushed.status_code == 200
+    views = {c["clip_id"]: c["view_count"] for c in flushed.json()}
+    assert views[clip["clip_id"]] == clip["view_count"] + 1
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.serialization import CLIP_CARD, Nested, card_serializer
+
+
+def clip_row(**overrides):
+    row = dict(
+        clip_id="c1", title="Clip", thumbnail_url=None, duration_seconds=30, view_count=7,
+        channel_username="neonwolf", channel_display_name="Neonwolf", channel_avatar_url=None,
+        category_id="cat", category_name="Games",
+    )
+    row.update(overrides)
+    return SimpleNamespace(**row)
+
+
+def test_clip_card_nests_channel_and_category():
+    assert CLIP_CARD(clip_row()) == {
+        "clip_id": "c1",
+        "title": "Clip",
+        "thumbnail_url": None,
+        "duration_seconds": 30,
+        "view_count": 7,
+        "channel": {"username": "neonwolf", "display_name": "Neonwolf", "avatar_url": None},
+        "category": {"category_id": "cat", "name": "Games"},
+    }
+
+
+def test_nested_object_is_none_without_its_present_field():
+    card = CLIP_CARD(clip_row(channel_username=None, category_id=None, category_name=None))
+    assert card["channel"] is None
+    assert card["category"] == {"category_id": None, "name": None}
+
+
+def test_keys_keep_the_order_of_the_fields():
+    assert list(CLIP_CARD(clip_row())) == [
+        "clip_id", "title", "thumbnail_url", "duration_seconds", "view_count", "channel", "category",
+    ]
+    with pytest.raises(ValueError):
+        card_serializer({"nested": Nested({"a": "a"}), "b": "b"})
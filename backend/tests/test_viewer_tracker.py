@@ -0,0 +1,53 @@
+from app.db.session import SessionLocal
+from app.models.channel import Channel
+from app.models.stream import Stream
+from app.services.viewer_tracker import ViewerTracker
+
+
+def worker() -> ViewerTracker:
+    return ViewerTracker(window_seconds=30, buckets=6, precision=10, flush_seconds=10, max_streams=100)
+
+
+def live_channel():
+    db = SessionLocal()
+    try:
+        return db.query(Channel.channel_id, Channel.stream_key).join(Stream, Stream.channel_id == Channel.channel_id).filter(
+            Channel.is_live == True, Stream.ended_at.is_(None)  # noqa: E712
+        ).first()
+    finally:
+        db.close()
+
+
+def stored_count(channel_id: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.get(Channel, channel_id).current_viewer_count
+    finally:
+        db.close()
+
+
+def test_workers_count_the_union_of_their_viewers(client):
+    channel_id, key = live_channel()
+    a, b = worker(), worker()
+    # Round-robin balancing: a viewer's requests can reach both workers
+    for i in range(80):
+        a.record(key, f"viewer-{i}")
+    for i in range(40, 120):
+        b.record(key, f"viewer-{i}")
+
+    a.flush()
+    b.flush()
+    assert 110 <= stored_count(channel_id) <= 130
+    # Another flush of either worker doesn't bring it back to its own share
+    a.flush()
+    assert 110 <= stored_count(channel_id) <= 130
+
+    # Worker a's viewers left: its sketch is removed on its next flush
+    a.forget(key)
+    a.flush()
+    b.flush()
+    assert 75 <= stored_count(channel_id) <= 85
+
+    b._windows.clear()
+    b.flush()
+    assert stored_count(channel_id) == 0